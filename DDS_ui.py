@@ -91,17 +91,21 @@ class Sweeper():
             if not q.empty():
                 cmd, args = q.get()
                 if cmd == 'run':
-                    for ph in range(*args):
-                        writer.write(ph)
-                        q_ret.put(ph)
-                        if not q.empty():
-                            q_ret.put(-1)
-                            break
-                    q_ret.put(-1)
+                    Sweeper.run(writer.write, range(*args), q, q_ret)
                 if cmd == 'quit':
                     return
             sleep(.1)
 
+    @staticmethod
+    def run(write, points, q, q_ret):
+        for p in points:
+            write(p)
+            q_ret.put(p)
+            if not q.empty():
+                q_ret.put(-1)
+                break
+        q_ret.put(-1)
+
 
 
 class DDSSingleChannelBack:
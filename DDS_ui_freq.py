@@ -1,3 +1,6 @@
+from time import perf_counter
+_start = perf_counter()  # cold start is measured from here, see DDS_ui_tk.py for comparison
+
 import matplotlib.pyplot as plt
 
 from matplotlib.widgets import Button, TextBox, Slider, CheckButtons
@@ -9,9 +12,12 @@ import matplotlib as mpl
 
 
 from time import sleep
+from statistics import median
 
 
 from my_DDS_write import DDSSingleChannelWriter
+from tuning_history import TuningHistory
+from latency_trace import LatencyTracer, NULL_TRACER
 
 
 import tkinter as tk  # for askyesno 
@@ -95,7 +101,7 @@ class MySlider():
 
 
 class DDSSingleChannelBack:
-    def __init__(self, writer, fine_step=None):
+    def __init__(self, writer, fine_step=None, history=False, trace=False):
         print('Initiating...')
 
         if not fine_step:
@@ -103,11 +109,18 @@ class DDSSingleChannelBack:
 
         self.writer = writer
         self.write_DDS = self.writer.write_full
+        self.history = None
+        if history:
+            self.history = TuningHistory('Channel %d history' % self.writer.channel)
+            self.write_DDS = self._write_with_history
 
         self.cur_freq = DDSSingleChannelWriter.inverse_transform_frequency(self.writer.frequency[self.writer.channel]) / 1e3
         self.cur_phase = DDSSingleChannelWriter.inverse_transform_phase(self.writer.phase[self.writer.channel])
+        self.cur_amp = DDSSingleChannelWriter.inverse_transform_amplitude(self.writer.amplitude[self.writer.channel])
 
         self.fine_step = fine_step
+        self.tracer = LatencyTracer() if trace else NULL_TRACER
+        self.writer.tracer = self.tracer
         self.draw()
 
         self.fine_type = 0  # 0 for frequency
@@ -116,20 +129,34 @@ class DDSSingleChannelBack:
         self.down.button.on_clicked(self.down_callback)
 
         self.sl.slider.on_changed(self.slider_on_change)
+        self.sl_amp.slider.on_changed(self.amplitude_on_change)
         self.select.cbutton.on_clicked(self.select_callback)
         self.tb_freq.tb.on_submit(self.textbox_on_submit)
         self.left.button.on_clicked(self.left_callback)
         self.right.button.on_clicked(self.right_callback)
 
         self.upload.button.on_clicked(lambda *_: self.writer.upload())
-        self.download.button.on_clicked(lambda *_: self.writer.download())
+        # shift-click bypasses the EEPROM shadow and reads the board again
+        self.download.button.on_clicked(lambda event: self.writer.download(force=event.key == 'shift'))
 
         self.fig.canvas.mpl_connect('close_event', lambda *_: self._close())
+        self.fig.canvas.mpl_connect('draw_event', self._on_draw)
+        self._ready = False
+        self._interaction_start = None
+        self.redraw_latency = []  # from callback entry to canvas drawn, in s
+        # from callback entry to frame written, in s; sent from a prepared frame or not
+        self.step_latency = {True: [], False: []}
+        self._stepping = None  # set while a phase step goes through the slider: True if already written
+        self._prepare_steps()
         self.fig.canvas.manager.set_window_title('Channel %d' % self.writer.channel)
 
     def draw(self):
         # basic setup
         self.fig = plt.figure(figsize=(6, 4))
+        if self.tracer is not NULL_TRACER:
+            # connected before any widget, so it runs ahead of their callbacks
+            for name in ('button_press_event', 'button_release_event', 'motion_notify_event', 'key_press_event'):
+                self.fig.canvas.mpl_connect(name, self.tracer.receive)
         self.fig.canvas.mpl_disconnect(
             self.fig.canvas.manager.key_press_handler_id)  # remove hotkeys
 
@@ -183,6 +210,11 @@ class DDSSingleChannelBack:
         self.sl.addAnnotate('Phase', (.5, 1.15), annotation_clip=False)
         self.sl.slider.set_val(self.cur_phase)
 
+        # amplitude, along the right edge
+        self.sl_amp = MySlider([.92, .2, .03, .6], '', 0, 1, valfmt='%.2f', orientation='vertical')
+        self.sl_amp.addAnnotate('Amp.', (.5, 1.1), ha='center', annotation_clip=False)
+        self.sl_amp.slider.set_val(self.cur_amp)
+
         # Type freq
         tb_freq_x = .08
         tb_freq_y = .65
@@ -225,50 +257,114 @@ class DDSSingleChannelBack:
         self.download = MyButton(
             [download_x, upload_y, download_width, upload_height], 'Download')
 
-    def up_callback(self, event):
+    def _on_draw(self, event):
+        self.tracer.end()
+        if not self._ready:
+            self._ready = True
+            print('Ready in %.0f ms' % ((perf_counter() - _start) * 1e3))
+        if self._interaction_start is not None:
+            self.redraw_latency.append(perf_counter() - self._interaction_start)
+            self._interaction_start = None
+
+    def _write_with_history(self, freq, phase, amp):
+        self.writer.write_full(freq, phase, amp)
+        self.history.append(freq, phase)
+
+    def _prepare_steps(self):
+        # frames for the next click either way, built while the user looks at the result
+        self.writer.prepare_steps(self.cur_freq, self.cur_phase, self.fine_step[self.fine_type], self.fine_type)
+
+    def _step(self, direction):
+        # the frame goes out before any widget is touched
+        written_ahead = self.writer.write_step(direction)
+        if written_ahead:
+            self._wire_latency(True)
         if self.fine_type:
-            self.cur_phase += self.fine_step[self.fine_type]
+            self.cur_phase += direction * self.fine_step[self.fine_type]
 
             # when slider is changed, the slider_on_changed is called automatically
             # the same applies to other button
-            # self.write_DDS(self.cur_freq, self.cur_phase)
+            self._stepping = written_ahead
             self.update_slider()
+            self._stepping = None
         else:
-            self.cur_freq += self.fine_step[self.fine_type]
-            self.write_DDS(self.cur_freq, self.cur_phase)
+            self.cur_freq += direction * self.fine_step[self.fine_type]
+            if written_ahead:
+                self._record()
+            else:
+                self.write_DDS(self.cur_freq, self.cur_phase, self.cur_amp)
+                self._wire_latency(False)
+                self._prepare_steps()
             self.update_tb()
 
+    def _wire_latency(self, prepared):
+        # up to the frame written, not the ack; a step that changed nothing sends no frame
+        written_at = self.writer.written_at
+        if written_at is not None and written_at >= self._interaction_start:
+            self.step_latency[prepared].append(written_at - self._interaction_start)
+
+    def _record(self):
+        if self.history is not None:
+            self.history.append(self.cur_freq, self.cur_phase)
+        self._prepare_steps()
+
+    def up_callback(self, event):
+        self.tracer.begin('up')
+        self._interaction_start = perf_counter()
+        self._step(1)
+
     def down_callback(self, event):
-        if self.fine_type:
-            self.cur_phase -= self.fine_step[self.fine_type]
-            self.update_slider()
-        else:
-            self.cur_freq -= self.fine_step[self.fine_type]
-            self.write_DDS(self.cur_freq, self.cur_phase)
-            self.update_tb()
+        self.tracer.begin('down')
+        self._interaction_start = perf_counter()
+        self._step(-1)
 
     def left_callback(self, event):
+        self.tracer.begin('left')
+        self._interaction_start = perf_counter()
         if self.fine_step[0] * 10 < 1:
             self.fine_step[0] *= 10
             self.tb_freq.tb.highlight_digit -= 1
             self.tb_freq.tb._update_highlight_position(
                 self.tb_freq.tb._chop_float('%.4f' % self.cur_freq))
+            self._prepare_steps()
         else:
             print('Frequency step too large. Use type-in instead.')
 
     def right_callback(self, event):
+        self.tracer.begin('right')
+        self._interaction_start = perf_counter()
         if self.tb_freq.tb.highlight_digit < 4:
             self.fine_step[0] *= .1
             self.tb_freq.tb.highlight_digit += 1
             self.tb_freq.tb._update_highlight_position(
                 self.tb_freq.tb._chop_float('%.4f' % self.cur_freq))
+            self._prepare_steps()
         else:
             print('Frequency step too small.')
 
     def slider_on_change(self, event):
+        # a phase step through the slider stays part of the up/down interaction
+        if self._stepping is None:
+            self.tracer.begin('slider')
+        if self._interaction_start is None:
+            self._interaction_start = perf_counter()
         # on some version of matplotlib, slider.val returns numpy.float64, which causes trouble
         self.cur_phase = float(self.sl.slider.val)
-        self.write_DDS(self.cur_freq, self.cur_phase)
+        if self._stepping:
+            self._record()
+            return
+        self.write_DDS(self.cur_freq, self.cur_phase, self.cur_amp)
+        if self._stepping is not None:
+            self._wire_latency(False)
+        self._prepare_steps()
+
+    def amplitude_on_change(self, event):
+        self.tracer.begin('amplitude')
+        if self._interaction_start is None:
+            self._interaction_start = perf_counter()
+        self.cur_amp = float(self.sl_amp.slider.val)
+        self.write_DDS(self.cur_freq, self.cur_phase, self.cur_amp)
+        self._prepare_steps()
 
     def select_callback(self, event):
         index = 0 if event[0] == 'F' else 1
@@ -279,14 +375,18 @@ class DDSSingleChannelBack:
             index = 1 - index
         for l in self.select.cbutton.lines[index]:
             l.set_visible(not l.get_visible())
+        self._prepare_steps()
 
     def textbox_on_submit(self, event):
+        self.tracer.begin('textbox')
+        self._interaction_start = perf_counter()
         if not isfloat(event):
             setAxesFrameColor(self.tb_freq.tb.ax, 'red')
         else:
             setAxesFrameColor(self.tb_freq.tb.ax, 'k')
             self.cur_freq = float(event)
-            self.write_DDS(self.cur_freq, self.cur_phase)
+            self.write_DDS(self.cur_freq, self.cur_phase, self.cur_amp)
+            self._prepare_steps()
             self.update_tb()
 
     def update_slider(self):
@@ -303,16 +403,28 @@ class DDSSingleChannelBack:
         print('Terminating program...')
         print('Current freq. %.3f' % (self.cur_freq))
         print('Current phase %.3f' % (self.cur_phase))
+        print('Current amplitude %.3f' % (self.cur_amp))
+        print('Updates sent %d, skipped %d (no register changed)' % (self.writer.sent, self.writer.skipped))
+        if self.redraw_latency:
+            print('Redraw latency median %.1f ms over %d interactions' % (
+                median(self.redraw_latency) * 1e3, len(self.redraw_latency)))
+        for prepared, latency in self.step_latency.items():
+            if latency:
+                print('Click to wire median %.3f ms over %d %s steps' % (
+                    median(latency) * 1e3, len(latency), 'prepared' if prepared else 'rebuilt'))
+        if self.tracer is not NULL_TRACER:
+            self.tracer.report()
+            self.tracer.export('trace_channel%d.json' % self.writer.channel)
         print('Arduino EEPROM reads:')
         self.writer.download()
 
-        if tk.messagebox.askyesno('', 'Do you want to upload current DDS params to Arduino?\n * Arduino has finite write cycle.', default='no'):
+        # nothing to ask when EEPROM already holds the current values
+        if self.writer.eeprom_outdated() and tk.messagebox.askyesno('', 'Do you want to upload current DDS params to Arduino?\n * Arduino has finite write cycle.', default='no'):
             self.writer.upload()
             self.writer.send_self_check()
 
         print('Please modify the entry in current_settings.csv as follows:')
-        print(self.writer.header+', '.join(['%.3f' % (DDSSingleChannelWriter.inverse_transform_frequency(f)/1e3)
-              for f in self.writer.frequency] + ['%.1f' % (DDSSingleChannelWriter.inverse_transform_phase(p)) for p in self.writer.phase]))
+        print(self.writer.settings_entry())
 
 
 if __name__ == '__main__':
@@ -0,0 +1,242 @@
+from time import perf_counter
+_start = perf_counter()  # cold start is measured from here, see DDS_ui_freq.py for comparison
+
+import tkinter as tk
+import tkinter.messagebox
+
+from math import log10, ceil
+from statistics import median
+
+
+from my_DDS_write import DDSSingleChannelWriter
+
+
+font = ('serif', 16)
+
+
+def isfloat(value):
+    try:
+        float(value)
+        return True
+    except ValueError:
+        return False
+
+
+class DDSSingleChannelTk:
+    '''
+    Same workflow as DDSSingleChannelBack in DDS_ui_freq.py, on plain Tk widgets
+    '''
+    root = None  # hidden; every channel gets a Toplevel
+    windows = 0
+
+    def __init__(self, writer, fine_step=None):
+        print('Initiating...')
+
+        if not fine_step:
+            fine_step = [.01, 1]  # (freq., phase) pair
+
+        self.writer = writer
+        self.write_DDS = self.writer.write_full
+
+        self.cur_freq = DDSSingleChannelWriter.inverse_transform_frequency(self.writer.frequency[self.writer.channel]) / 1e3
+        self.cur_phase = DDSSingleChannelWriter.inverse_transform_phase(self.writer.phase[self.writer.channel])
+        self.cur_amp = DDSSingleChannelWriter.inverse_transform_amplitude(self.writer.amplitude[self.writer.channel])
+
+        self.fine_step = fine_step
+        # the most significant digit of the frequency step, see step2digit in color_annotation.py
+        self.highlight_digit = ceil(log10(1. / self.fine_step[0]))
+        self.redraw_latency = []  # from callback entry to widgets drawn, in s
+
+        if DDSSingleChannelTk.root is None:
+            DDSSingleChannelTk.root = tk.Tk()
+            DDSSingleChannelTk.root.withdraw()
+        DDSSingleChannelTk.windows += 1
+        self.window = tk.Toplevel(DDSSingleChannelTk.root)
+        self.window.title('Channel %d' % self.writer.channel)
+        self.window.protocol('WM_DELETE_WINDOW', self._close)
+
+        self.draw()
+        self.update_tb()
+
+        # only once the window manager shows the window, not when the widgets are laid out
+        self._ready_id = self.window.bind('<Map>', self._ready)
+
+    def _ready(self, event):
+        if event.widget is not self.window:
+            return  # children are mapped too and reach the window through their bindtags
+        self.window.unbind('<Map>', self._ready_id)
+        self.window.update_idletasks()
+        print('Ready in %.0f ms' % ((perf_counter() - _start) * 1e3))
+
+    def draw(self):
+        w = self.window
+
+        tk.Label(w, text='Coarse', font=font).grid(row=0, column=0, columnspan=3)
+        tk.Label(w, text='Fine', font=font).grid(row=0, column=4, columnspan=2)
+        tk.Frame(w, width=1, bg='grey').grid(row=0, column=3, rowspan=7, sticky='ns', padx=10)
+
+        # amplitude, along the right edge; top is full scale
+        tk.Label(w, text='Amp.', font=font).grid(row=0, column=6)
+        self.sl_amp = tk.Scale(w, from_=1, to=0, resolution=.001, orient='vertical', length=200,
+                               font=font, command=self.amplitude_on_change)
+        self.sl_amp.set(self.cur_amp)
+        self.sl_amp.grid(row=1, column=6, rowspan=6)
+
+        # Type freq
+        tk.Label(w, text='Freq. (MHz)', font=font).grid(row=1, column=0, columnspan=3, sticky='w')
+        self.tb_freq = tk.Text(w, height=1, width=10, font=font, highlightthickness=1)
+        self.tb_freq.tag_configure('highlight', foreground='red')
+        self.tb_freq.grid(row=2, column=0, columnspan=3)
+        self.tb_freq.bind('<Return>', self.textbox_on_submit)
+
+        # Buttons to control significant digit
+        tk.Button(w, text='←', font=font, command=self.left_callback).grid(row=3, column=0, sticky='e')
+        tk.Button(w, text='→', font=font, command=self.right_callback).grid(row=3, column=2, sticky='w')
+
+        # Hand tuning
+        tk.Label(w, text='Phase', font=font).grid(row=4, column=0, columnspan=3)
+        self.sl = tk.Scale(w, from_=0, to=360, resolution=.1, orient='horizontal', length=240,
+                           font=font, command=self.slider_on_change)
+        self.sl.set(self.cur_phase)
+        self.sl.grid(row=5, column=0, columnspan=3)
+
+        # Buttons for fine tuning
+        tk.Button(w, text='↑', font=font, width=4, height=2,
+                  command=self.up_callback).grid(row=1, column=4, rowspan=2)
+        tk.Button(w, text='↓', font=font, width=4, height=2,
+                  command=self.down_callback).grid(row=4, column=4, rowspan=2)
+
+        self.fine_type = tk.IntVar(value=0)  # 0 for frequency
+        tk.Radiobutton(w, text='Freq', font=font, variable=self.fine_type, value=0).grid(row=2, column=5, sticky='w')
+        tk.Radiobutton(w, text='Phase', font=font, variable=self.fine_type, value=1).grid(row=3, column=5, sticky='w')
+
+        # Buttons to upload Arduino EEPROM and readback
+        tk.Button(w, text='Upload', font=font, command=lambda: self.writer.upload()).grid(row=6, column=0)
+        self.download = tk.Button(w, text='Download', font=font, command=lambda: self.writer.download())
+        self.download.grid(row=6, column=1, columnspan=2)
+
+        # shift-click bypasses the EEPROM shadow and reads the board again
+        def force_download(event):
+            self.writer.download(force=True)
+            return 'break'
+        self.download.bind('<Shift-Button-1>', force_download)
+
+    def _redrawn(self, start):
+        self.window.update_idletasks()
+        self.redraw_latency.append(perf_counter() - start)
+
+    def up_callback(self):
+        start = perf_counter()
+        if self.fine_type.get():
+            self.cur_phase += self.fine_step[1]
+            self.update_slider()
+        else:
+            self.cur_freq += self.fine_step[0]
+            self.write_DDS(self.cur_freq, self.cur_phase, self.cur_amp)
+            self.update_tb()
+        self._redrawn(start)
+
+    def down_callback(self):
+        start = perf_counter()
+        if self.fine_type.get():
+            self.cur_phase -= self.fine_step[1]
+            self.update_slider()
+        else:
+            self.cur_freq -= self.fine_step[0]
+            self.write_DDS(self.cur_freq, self.cur_phase, self.cur_amp)
+            self.update_tb()
+        self._redrawn(start)
+
+    def left_callback(self):
+        start = perf_counter()
+        if self.fine_step[0] * 10 < 1:
+            self.fine_step[0] *= 10
+            self.highlight_digit -= 1
+            self.update_tb()
+        else:
+            print('Frequency step too large. Use type-in instead.')
+        self._redrawn(start)
+
+    def right_callback(self):
+        start = perf_counter()
+        if self.highlight_digit < 4:
+            self.fine_step[0] *= .1
+            self.highlight_digit += 1
+            self.update_tb()
+        else:
+            print('Frequency step too small.')
+        self._redrawn(start)
+
+    def slider_on_change(self, val):
+        start = perf_counter()
+        self.cur_phase = float(val)
+        self.write_DDS(self.cur_freq, self.cur_phase, self.cur_amp)
+        self._redrawn(start)
+
+    def amplitude_on_change(self, val):
+        start = perf_counter()
+        self.cur_amp = float(val)
+        self.write_DDS(self.cur_freq, self.cur_phase, self.cur_amp)
+        self._redrawn(start)
+
+    def textbox_on_submit(self, event):
+        start = perf_counter()
+        text = self.tb_freq.get('1.0', 'end').strip()
+        if not isfloat(text):
+            self.tb_freq.configure(highlightbackground='red', highlightcolor='red')
+        else:
+            self.tb_freq.configure(highlightbackground='black', highlightcolor='black')
+            self.cur_freq = float(text)
+            self.write_DDS(self.cur_freq, self.cur_phase, self.cur_amp)
+            self.update_tb()
+        self._redrawn(start)
+        return 'break'  # no newline in the textbox
+
+    def update_slider(self):
+        self.cur_phase %= 360  # prevent "-1"
+        # the scale calls slider_on_change by itself
+        self.sl.set(self.cur_phase)
+
+    def update_tb(self):
+        text = '%.4f' % self.cur_freq
+        self.tb_freq.delete('1.0', 'end')
+        self.tb_freq.insert('1.0', text)
+        index = len(text) - (4 - self.highlight_digit) - 1
+        self.tb_freq.tag_add('highlight', '1.%d' % index, '1.%d' % (index + 1))
+
+    def _close(self):
+        print('Terminating program...')
+        print('Current freq. %.3f' % (self.cur_freq))
+        print('Current phase %.3f' % (self.cur_phase))
+        print('Current amplitude %.3f' % (self.cur_amp))
+        print('Updates sent %d, skipped %d (no register changed)' % (self.writer.sent, self.writer.skipped))
+        if self.redraw_latency:
+            print('Redraw latency median %.1f ms over %d interactions' % (
+                median(self.redraw_latency) * 1e3, len(self.redraw_latency)))
+        print('Arduino EEPROM reads:')
+        self.writer.download()
+
+        # nothing to ask when EEPROM already holds the current values
+        if self.writer.eeprom_outdated() and tk.messagebox.askyesno('', 'Do you want to upload current DDS params to Arduino?\n * Arduino has finite write cycle.', default='no', parent=self.window):
+            self.writer.upload()
+            self.writer.send_self_check()
+
+        print('Please modify the entry in current_settings.csv as follows:')
+        print(self.writer.settings_entry())
+
+        self.window.destroy()
+        DDSSingleChannelTk.windows -= 1
+        if not DDSSingleChannelTk.windows:
+            DDSSingleChannelTk.root.destroy()
+
+
+if __name__ == '__main__':
+    # Example 1: tune for PDH signal
+    # Assume LO on channel 3 and EOM drive on channel 0
+    DDSSingleChannelTk(DDSSingleChannelWriter('local', 3, [0]))
+
+    # Example 2: four-channel sine-wave generator
+    # for ch in range(4):
+    #     DDSSingleChannelTk(DDSSingleChannelWriter('local', ch))
+
+    DDSSingleChannelTk.root.mainloop()
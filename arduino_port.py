@@ -14,6 +14,14 @@ def get_line_bin(ser):
     # useful information may get lost! 
     return ser.readline()[:-1]
 
+def get_bytes_bin(ser, n):
+    # binary payload may itself contain b'\n', so read a fixed length instead
+    # returns None when the reply is short or not terminated
+    msg = ser.read(n + 1)
+    if len(msg) == n + 1 and msg[-1:] == b'\n':
+        return msg[:-1]
+    return None
+
 
 def which_port(iD):
     # Finds ports for user to select
@@ -59,7 +67,13 @@ def setup_arduino_port(port, baud=115200, timeout=.3, max_attempts=5):
                 break
     else: 
         raise ArduinoHandShakeException('Arduino handshake failed! Did you upload v1_force-write to Arduino? ')
-        
+
+    handshake(ser, max_attempts)
+    return ser
+
+
+def handshake(ser, max_attempts=5):
+    # Arduino only listens for "hello" shortly after "Arduino setup finished!"
     ser.write('hello'.encode())
     attempt = 0
     while attempt < max_attempts:
@@ -72,7 +86,6 @@ def setup_arduino_port(port, baud=115200, timeout=.3, max_attempts=5):
                 break
     else: 
         raise ArduinoHandShakeException('Arduino handshake failed! Did you upload v1_force-write to Arduino? ')
-    return ser
 
 
 
@@ -0,0 +1,278 @@
+import asyncio
+
+import serial_asyncio
+
+from arduino_port import which_port, open_settings, ArduinoHandShakeException
+from my_DDS_write import (DDSSingleChannelWriter, BoardShadow, Command,
+                          pack_channel_parameter, unpack_channel_parameter, PAYLOAD_LENGTH)
+from collections.abc import Iterable
+
+
+async def wait_for_banner(reader, timeout=.3, max_attempts=5):
+    # Arduino sends a line containing "Arduino" at each step of the handshake
+    attempt = 0
+    while attempt < max_attempts:
+        try:
+            msg = await asyncio.wait_for(reader.readline(), timeout)
+        except asyncio.TimeoutError:
+            msg = b''
+        if not msg.strip():
+            attempt += 1
+            await asyncio.sleep(.5)
+        elif b'Arduino' in msg:
+            return
+    raise ArduinoHandShakeException('Arduino handshake failed! Did you upload v1_force-write to Arduino? ')
+
+
+class AsyncBoard():
+    '''
+    One serial connection; requests from all writers on it are served in turn
+    '''
+    boards = {}
+
+    def __init__(self, reader, writer, reply_timeout=0.):
+        self.reader = reader
+        self.writer = writer
+        self.lock = asyncio.Lock()
+        # a request abandoned by cancellation or timeout may still get its reply
+        self.stale = False
+        self.reply_timeout = reply_timeout  # longest any writer waits for a reply, in s
+
+    @staticmethod
+    async def of(iD, baud=115200, timeout=.3):
+        port = which_port(iD)
+        if port not in AsyncBoard.boards:
+            # store the task, so writers opening the same board concurrently share one connection
+            AsyncBoard.boards[port] = asyncio.ensure_future(AsyncBoard.connect(port, baud, timeout))
+        task = AsyncBoard.boards[port]
+        try:
+            # shielded, so that an opener giving up does not cancel the connection for the others
+            return await asyncio.shield(task)
+        except BaseException:
+            # forget the connection only if it failed, not if this opener gave up
+            if task.done() and (task.cancelled() or task.exception() is not None) and AsyncBoard.boards.get(port) is task:
+                AsyncBoard.boards.pop(port)
+            raise
+
+    @staticmethod
+    async def connect(port, baud=115200, timeout=.3):
+        reader, writer = await serial_asyncio.open_serial_connection(url=port, baudrate=baud)
+        board = AsyncBoard(reader, writer)
+        await board.handshake(timeout)
+        return board
+
+    async def handshake(self, timeout=.3):
+        async with self.lock:
+            await wait_for_banner(self.reader, timeout)
+            self.writer.write('hello'.encode())
+            await wait_for_banner(self.reader, timeout)
+
+    async def _discard_stale(self):
+        # replies have no id, so drain for as long as any request would wait for one,
+        # then until the line is quiet
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self.reply_timeout
+        while True:
+            try:
+                if not await asyncio.wait_for(self.reader.read(256), max(deadline - loop.time(), .05)):
+                    break  # connection closed
+            except asyncio.TimeoutError:
+                break
+        self.stale = False
+
+    async def request(self, frame, reply_length=None, timeout=None):
+        '''
+        Sends frame and returns the reply: a line, or reply_length bytes of binary
+        payload (None if malformed). Fails with asyncio.TimeoutError if the reply
+        takes more than timeout s; waiting for the port does not count
+        '''
+        async with self.lock:
+            if self.stale:
+                await self._discard_stale()
+            try:
+                return await asyncio.wait_for(self._exchange(frame, reply_length), timeout)
+            except BaseException:
+                self.stale = True
+                raise
+
+    async def _exchange(self, frame, reply_length):
+        self.writer.write(frame)
+        await self.writer.drain()
+        if reply_length is None:
+            return (await self.reader.readline())[:-1]
+        msg = await self.reader.readexactly(reply_length + 1)
+        return msg[:-1] if msg[-1:] == b'\n' else None
+
+    def close(self):
+        self.writer.close()
+
+
+class AsyncDDSSingleChannelWriter():
+    '''
+    asyncio counterpart of DDSSingleChannelWriter. Create with
+        writer = await AsyncDDSSingleChannelWriter.open(name, channel, shared_channels)
+    Every request is awaitable, cancellable, and fails with asyncio.TimeoutError after timeout s without a reply
+    '''
+
+    def __init__(self, name, channel, shared_channels=None, verify=False, timeout=1.):
+        row = open_settings(name)
+        self.iD = row[0]
+        self.header = '%s, %s, '%(name, row[0])
+        self.frequency = [DDSSingleChannelWriter.transform_frequency(
+            float(_) * 1e3) for _ in row[1:5]]
+        self.phase = [DDSSingleChannelWriter.transform_phase(
+            float(_)) for _ in row[5:9]]
+        self.amplitude = [DDSSingleChannelWriter.transform_amplitude(
+            float(_)) for _ in row[9:13]] or [DDSSingleChannelWriter.transform_amplitude(1)] * 4
+
+        self.shadow = BoardShadow.of(row[0])
+        self.verify = verify
+        self.timeout = timeout
+
+        self.channel = channel
+        if shared_channels is None:
+            shared_channels = [self.channel]
+        elif isinstance(shared_channels, int):
+            shared_channels = [self.channel, shared_channels]
+        elif isinstance(shared_channels, Iterable):
+            shared_channels = [self.channel] + [ch for ch in shared_channels]
+        self.shared_channels = shared_channels
+
+        self.sent = 0
+        self.skipped = 0
+        self.board = None
+
+    @staticmethod
+    async def open(name, channel, shared_channels=None, verify=False, timeout=1.):
+        writer = AsyncDDSSingleChannelWriter(name, channel, shared_channels, verify, timeout)
+        await writer.handshake()
+        return writer
+
+    async def handshake(self):
+        self.board = await asyncio.wait_for(AsyncBoard.of(self.iD), 10 * self.timeout)
+        self.board.reply_timeout = max(self.board.reply_timeout, self.timeout)
+        # update all channels, otherwise some may not be able to open
+        await self._update(range(4), force=True)
+
+    async def _request(self, frame, reply_length=None):
+        return await self.board.request(frame, reply_length, self.timeout)
+
+    async def write(self, new_phi):
+        self.phase[self.channel] = DDSSingleChannelWriter.transform_phase(new_phi)
+        return await self._update()
+
+    async def write_full(self, new_freq, new_phi, new_amp=None):
+        self.frequency = [
+            DDSSingleChannelWriter.transform_frequency(new_freq * 1000)] * 4
+        self.phase[self.channel] = DDSSingleChannelWriter.transform_phase(new_phi)
+        if new_amp is not None:
+            self.amplitude[self.channel] = DDSSingleChannelWriter.transform_amplitude(new_amp)
+        return await self._update()
+
+    async def set_channel(self, ch, frequency=None, phase=None, amplitude=None):
+        if frequency is not None:
+            self.frequency[ch] = DDSSingleChannelWriter.transform_frequency(frequency * 1000)
+        if phase is not None:
+            self.phase[ch] = DDSSingleChannelWriter.transform_phase(phase)
+        if amplitude is not None:
+            self.amplitude[ch] = DDSSingleChannelWriter.transform_amplitude(amplitude)
+        return await self._update([ch])
+
+    def _words(self, ch):
+        return self.frequency[ch], self.phase[ch], self.amplitude[ch]
+
+    async def _update(self, channels=None, force=False):
+        if channels is None:
+            channels = self.shared_channels
+        if not force:
+            channels = self.shadow.changed(channels, self.frequency, self.phase, self.amplitude)
+            if not channels:
+                self.skipped += 1
+                return True
+        self.sent += 1
+
+        words = list(self.frequency), list(self.phase), list(self.amplitude)  # may change while awaiting
+        if self.verify:
+            bin_str = await self._request(DDSSingleChannelWriter._command_byte(Command.VERIFY, channels) +
+                                          pack_channel_parameter(*words), PAYLOAD_LENGTH)
+            if bin_str is None:
+                self.shadow.registers = [None] * 4
+                return False
+            self.shadow.registers = list(zip(*unpack_channel_parameter(bin_str)))
+            return not self.shadow.changed(channels, *words)
+
+        acked = await self._request(DDSSingleChannelWriter._command_byte(Command.UPDATE, channels) +
+                                    pack_channel_parameter(*words))
+        for ch in channels:
+            self.shadow.registers[ch] = tuple(w[ch] for w in words) if acked.strip() == b'0' else None
+        return acked.strip() == b'0'
+
+    def eeprom_outdated(self):
+        return any(self.shadow.eeprom[ch] != self._words(ch) for ch in self.shared_channels)
+
+    async def upload(self, force=False):
+        if not force and not self.eeprom_outdated():
+            return True
+        words = list(self.frequency), list(self.phase), list(self.amplitude)
+        acked = (await self._request(DDSSingleChannelWriter._command_byte(Command.UPLOAD, self.shared_channels) +
+                                     pack_channel_parameter(*words))).strip() == b'0'
+        for ch in self.shared_channels:
+            self.shadow.eeprom[ch] = tuple(w[ch] for w in words) if acked else None
+        return acked
+
+    async def download(self, force=False):
+        '''
+        Returns the (frequency, phase, amplitude) tuning words in EEPROM, None if no valid reply
+        '''
+        if not force and None not in self.shadow.eeprom:
+            return tuple(map(list, zip(*self.shadow.eeprom)))
+        bin_str = await self._request(DDSSingleChannelWriter._command_byte(Command.DNLOAD, self.shared_channels) +
+                                      b'\x00'*PAYLOAD_LENGTH, PAYLOAD_LENGTH)
+        if bin_str is None:
+            self.shadow.eeprom = [None] * 4
+            return None
+        words = unpack_channel_parameter(bin_str)
+        self.shadow.eeprom = list(zip(*words))
+        return words
+
+    async def sweep(self, phases=None, frequencies=None, amplitudes=None, dwell=0.):
+        '''
+        Steps through phases (Deg.) and/or amplitudes ([0, 1]) of this channel and/or
+        frequencies (MHz) of the shared channels, waiting dwell s at each point.
+        Sweeps given together advance in step. Cancel the task to stop
+        '''
+        if frequencies is None and phases is None and amplitudes is None:
+            raise RuntimeError('Nothing to sweep.')
+
+        # tuning words up front, so each step only packs a frame
+        frequency_words = phase_words = amplitude_words = None
+        if frequencies is not None:
+            frequency_words = [DDSSingleChannelWriter.transform_frequency(f * 1000) for f in frequencies]
+        if phases is not None:
+            phase_words = [DDSSingleChannelWriter.transform_phase(p) for p in phases]
+        if amplitudes is not None:
+            amplitude_words = DDSSingleChannelWriter.amplitude_words(list(amplitudes)).tolist()
+        n = min(len(w) for w in (frequency_words, phase_words, amplitude_words) if w is not None)
+
+        for k in range(n):
+            if frequency_words is not None:
+                for ch in self.shared_channels:
+                    self.frequency[ch] = frequency_words[k]
+            if phase_words is not None:
+                self.phase[self.channel] = phase_words[k]
+            if amplitude_words is not None:
+                self.amplitude[self.channel] = amplitude_words[k]
+            await self._update()
+            await asyncio.sleep(dwell)
+
+
+if __name__ == '__main__':
+    async def main():
+        # Assume LO on channel 3 and EOM drive on channel 0
+        writer = await AsyncDDSSingleChannelWriter.open('local', 3, [0])
+        sweep = asyncio.ensure_future(writer.sweep(phases=range(0, 180, 10), dwell=.5))
+        await asyncio.sleep(3)
+        sweep.cancel()
+        print(await writer.download())
+
+    asyncio.run(main())
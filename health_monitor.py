@@ -0,0 +1,142 @@
+import threading
+from time import perf_counter
+
+import serial
+
+from arduino_port import get_bytes_bin, handshake, ArduinoHandShakeException
+from my_DDS_write import (DDSSingleChannelWriter, Command, pack_channel_parameter, unpack_channel_parameter,
+                          PAYLOAD_LENGTH)
+
+
+class HealthMonitor():
+    '''
+    Background check of a board against the host shadow. If Arduino reboots
+    (USB glitch, brown-out) it falls back to EEPROM values; the monitor notices
+    the banner, or registers that differ from the shadow, and restores them.
+
+        monitor = HealthMonitor(writer).start()
+        ...
+        monitor.stop()
+
+    Every poll s it looks for unsolicited bytes; every period s it also reads the
+    registers back. It never waits for the port: when a foreground request holds it,
+    the check is skipped. Its share of time on the port stays below duty
+    '''
+
+    def __init__(self, writer, poll=.1, period=2., duty=.02):
+        self.writer = writer
+        self.poll = poll
+        self.period = period
+        self.duty = duty
+
+        self.reboots = 0
+        self.failures = 0  # checks without a valid reply
+        self.restores = 0
+
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+        print('Health monitor: %d reboots, %d failed checks, %d restores' % (
+            self.reboots, self.failures, self.restores))
+
+    def _run(self):
+        quiet = perf_counter()  # last time the port was seen empty
+        next_check = quiet + self.period
+        wait = self.poll
+        while not self._stop.wait(wait):
+            lock = self.writer.shadow.lock
+            if not lock.acquire(blocking=False):
+                wait = self.poll  # foreground busy, try again later
+                continue
+
+            start = perf_counter()
+            rebooted = False
+            try:
+                if self.writer.ser.in_waiting:
+                    rebooted = self._unsolicited(quiet)
+                else:
+                    quiet = start
+                    if start >= next_check:
+                        self._check()
+                        next_check = perf_counter() + self.period
+            except serial.SerialException as e:
+                self.failures += 1
+                print('Health check failed: %s' % e)
+            finally:
+                lock.release()
+
+            if rebooted:
+                # a rare, forced hold: not counted in the duty
+                quiet = perf_counter()
+                wait = self.poll
+            else:
+                wait = max(self.poll, (perf_counter() - start) / self.duty)
+
+    def _unsolicited(self, quiet):
+        '''
+        True if the bytes are the banner of a reboot, in which case the board is
+        restored before returning. Called with the port held
+        '''
+        msg = self.writer.ser.read(self.writer.ser.in_waiting)
+        if b'Arduino setup finished' not in msg:
+            return False  # e.g. a late reply to an abandoned request
+        seen = perf_counter()  # the banner came between quiet and seen
+
+        self.reboots += 1
+        print('Arduino rebooted, restoring...')
+        # Arduino only listens for "hello" for 500 ms after the banner; later it
+        # would be taken as a command. Meanwhile nothing else may reach it
+        if seen - quiet < .3:
+            try:
+                handshake(self.writer.ser)  # until "Arduino ready!"
+            except ArduinoHandShakeException:
+                print('Arduino did not answer the handshake!')
+        else:
+            self._stop.wait(max(0., seen + .6 - perf_counter()))
+        self.writer.ser.reset_input_buffer()
+        self._restore()
+        return True
+
+    def _check(self):
+        # not writer.readback, which would overwrite the shadow we compare against
+        self.writer.ser.write(self.writer.commands[Command.READBACK]+b'\x00'*PAYLOAD_LENGTH)
+        bin_str = get_bytes_bin(self.writer.ser, PAYLOAD_LENGTH)
+        if bin_str is None:
+            self.failures += 1
+            print('No valid reply from Arduino!')
+            return
+
+        registers = self.writer.shadow.registers
+        live = list(zip(*unpack_channel_parameter(bin_str)))
+        drift = [ch for ch in range(4) if registers[ch] is not None and registers[ch] != live[ch]]
+        if drift:
+            print('Channel %s differs from host, restoring...' % ', '.join(map(str, drift)))
+            self._restore()
+
+    def _restore(self):
+        # channels the host has no record of are left alone
+        registers = self.writer.shadow.registers
+        known = [ch for ch in range(4) if registers[ch] is not None]
+        if not known:
+            return
+        words = [[r[k] if r else 0 for r in registers] for k in range(3)]
+        if self.writer.send_frame(DDSSingleChannelWriter._command_byte(Command.UPDATE, known) +
+                                  pack_channel_parameter(*words)):
+            self.restores += 1
+        else:
+            print('Restore not acknowledged, retrying at the next check.')
+
+
+if __name__ == '__main__':
+    # Assume LO on channel 3 and EOM drive on channel 0
+    writer = DDSSingleChannelWriter('local', 3, [0])
+    monitor = HealthMonitor(writer).start()
+    input('Monitoring, press Enter to stop...\n')
+    monitor.stop()
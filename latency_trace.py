@@ -0,0 +1,100 @@
+import json
+import numpy as np
+
+from time import perf_counter_ns
+
+
+class NullTracer():
+    '''
+    Stands in when tracing is off; every hook is a no-op
+    '''
+
+    def receive(self, *_):
+        pass
+
+    def begin(self, name):
+        pass
+
+    def mark(self, stage):
+        pass
+
+    def end(self, *_):
+        pass
+
+
+NULL_TRACER = NullTracer()
+
+
+class LatencyTracer():
+    '''
+    Timestamps the stages of each interaction, from the GUI event to the redrawn canvas.
+    Stages missing from an interaction (e.g. no frame sent) are left out
+    '''
+    stages = ('event', 'callback', 'encode', 'written', 'ack', 'redraw')
+
+    def __init__(self):
+        self.received = None  # time of the latest raw GUI event
+        self.current = None
+        self.interactions = []
+
+    def receive(self, *_):
+        self.received = perf_counter_ns()
+
+    def begin(self, name):
+        now = perf_counter_ns()
+        # callbacks triggered from another callback (e.g. button -> slider) belong to it
+        if self.current is not None and 'written' not in self.current:
+            return
+        if self.current is not None:
+            self.interactions.append(self.current)  # not redrawn yet
+        self.current = {'name': name, 'event': self.received or now, 'callback': now}
+        self.received = None
+
+    def mark(self, stage):
+        if self.current is not None and stage not in self.current:
+            self.current[stage] = perf_counter_ns()
+
+    def end(self, *_):
+        if self.current is not None:
+            self.mark('redraw')
+            self.interactions.append(self.current)
+            self.current = None
+
+    def stats(self):
+        '''
+        stage -> latency since the previous stage in ms: (count, median, 95th percentile, max)
+        '''
+        ret = {}
+        for stage in self.stages[1:]:
+            delay = []
+            for it in self.interactions:
+                if stage not in it:
+                    continue
+                previous = max(it[s] for s in self.stages[:self.stages.index(stage)] if s in it)
+                delay.append((it[stage] - previous) / 1e6)
+            if delay:
+                ret[stage] = (len(delay), float(np.median(delay)), float(np.percentile(delay, 95)), float(np.max(delay)))
+        return ret
+
+    def report(self):
+        print('%-9s %-6s %-8s %-8s %-8s' % ('Stage', 'Count', 'Median', '95%', 'Max'))
+        for stage, (count, med, p95, top) in self.stats().items():
+            print('%-9s %-6d %-8.3f %-8.3f %-8.3f' % (stage, count, med, p95, top))
+
+    def export(self, path):
+        '''
+        Chrome trace event format; open with chrome://tracing or ui.perfetto.dev
+        '''
+        if not self.interactions:
+            return
+        origin = min(it['event'] for it in self.interactions)
+        events = []
+        for it in self.interactions:
+            times = [(s, it[s]) for s in self.stages if s in it]
+            events.append({'name': it['name'], 'ph': 'X', 'pid': 1, 'tid': 0,
+                           'ts': (times[0][1] - origin) / 1e3, 'dur': (times[-1][1] - times[0][1]) / 1e3})
+            for (_, start), (stage, stop) in zip(times, times[1:]):
+                events.append({'name': stage, 'cat': it['name'], 'ph': 'X', 'pid': 1, 'tid': 1,
+                               'ts': (start - origin) / 1e3, 'dur': (stop - start) / 1e3})
+        with open(path, 'w') as f:
+            json.dump({'traceEvents': events, 'displayTimeUnit': 'ms'}, f)
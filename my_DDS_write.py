@@ -1,9 +1,12 @@
 import numpy as np
 import time
 import csv
+import threading
+from contextlib import contextmanager
 
-from arduino_port import setup_arduino, open_settings, setup_arduino_port, get_line_bin
-from collections import Iterable
+from arduino_port import setup_arduino, open_settings, setup_arduino_port, get_line_bin, get_bytes_bin
+from latency_trace import NULL_TRACER
+from collections.abc import Iterable
 
 def counted_func(prefix=None):
     def inner(f):
@@ -13,20 +16,46 @@ def counted_func(prefix=None):
             nonlocal cnt
             cnt += 1
             print('%s[%d]\t' % (prefix, cnt), end='')
-            f(*args, **kwargs)
+            return f(*args, **kwargs)
 
         return ret
     return inner
 
 
-def show_channel_parameter(bin_str):
-    print('%-4s %-8s %-4s' % ('Ch.', 'Freq.', 'Phase'))
+def locked(f):
+    # serial I/O of a board is one request at a time, see BoardShadow.lock
+    def ret(self, *args, **kwargs):
+        with self.shadow.lock:
+            return f(self, *args, **kwargs)
+    return ret
+
+
+CHANNEL_LENGTH = 8
+PAYLOAD_LENGTH = 4 * CHANNEL_LENGTH
+
+
+def pack_channel_parameter(frequency, phase, amplitude):
+    # 4 channel x 8 bytes; 4 bytes frequency, 2 bytes phase, 2 bytes amplitude
+    return b''.join(f.to_bytes(4, 'big') + p.to_bytes(2, 'big') + a.to_bytes(2, 'big')
+                    for f, p, a in zip(frequency, phase, amplitude))
+
+
+def unpack_channel_parameter(bin_str):
+    frequency = [int().from_bytes(bin_str[8*ch:8*ch+4], 'big') for ch in range(4)]
+    phase = [int().from_bytes(bin_str[8*ch+4:8*ch+6], 'big') for ch in range(4)]
+    # only 10 bits are used
+    amplitude = [int().from_bytes(bin_str[8*ch+6:8*ch+8], 'big') & 0x3ff for ch in range(4)]
+    return frequency, phase, amplitude
+
+
+def show_channel_parameter(frequency, phase, amplitude):
+    print('%-4s %-8s %-6s %-4s' % ('Ch.', 'Freq.', 'Phase', 'Amp.'))
     for ch in range(4):
-        print('%-4d %-8d %-4.1f' % (
+        print('%-4d %-8d %-6.1f %-4.2f' % (
             ch,
-            DDSSingleChannelWriter.inverse_transform_frequency(int().from_bytes(
-                bin_str[6*ch:6*ch+4], 'big') / 1000),  # in the unit of MHz
-            DDSSingleChannelWriter.inverse_transform_phase(int().from_bytes(bin_str[6*ch+4:6*ch+6], 'big')))
+            DDSSingleChannelWriter.inverse_transform_frequency(frequency[ch] / 1000),  # in the unit of MHz
+            DDSSingleChannelWriter.inverse_transform_phase(phase[ch]),
+            DDSSingleChannelWriter.inverse_transform_amplitude(amplitude[ch]))
         )
 
 
@@ -35,14 +64,60 @@ class Command():
     UPLOAD = 1
     DNLOAD = 2
     EXIT  = 3
+    READBACK = 4  # live FTW/POW/ASF of all channels
+    VERIFY = 5  # UPDATE, acknowledged with a READBACK
+    PROFILE = 6  # store profile, index in the high nibble
+    SELECT = 7  # select profile, index in the high nibble; single byte
+    RAMP = 8  # configure linear sweep
+    SWEEP_UP = 9  # single byte
+    SWEEP_DOWN = 10  # single byte
+
+
+class Ramp():
+    # AFP select field of the channel function register
+    OFF = 0
+    FREQUENCY = 2
+    PHASE = 3
+
+
+class BoardShadow():
+    '''
+    What the host believes a board holds. Writers on the same board share one.
+    '''
+    boards = {}
+
+    def __init__(self):
+        # held for each request/reply on the board's port
+        self.lock = threading.RLock()
+        # (frequency, phase, amplitude) tuning words per channel, None if unknown
+        self.eeprom = [None] * 4
+        # same for the chip registers, as last acknowledged or read back
+        self.registers = [None] * 4
+        # (frequency, phase, amplitude) of all channels per profile slot
+        self.profiles = [None] * DDSSingleChannelWriter.n_profiles
+
+    @staticmethod
+    def of(iD):
+        if iD not in BoardShadow.boards:
+            BoardShadow.boards[iD] = BoardShadow()
+        return BoardShadow.boards[iD]
+
+    def changed(self, channels, frequency, phase, amplitude):
+        '''
+        Channels whose registers are not known to hold these tuning words
+        '''
+        return [ch for ch in channels if self.registers[ch] != (frequency[ch], phase[ch], amplitude[ch])]
 
 
 class DDSSingleChannelWriter():
     fclk = 500000  # see Arduino code v1.ino
+    n_profiles = 8  # PROFILE_COUNT in Arduino code
+    max_ramp_rate = 255  # ramp rate registers are 8-bit, in units of SYNC_CLK = fclk / 4
 
-    def __init__(self, name, channel, shared_channels=None):
+    def __init__(self, name, channel, shared_channels=None, verify=False):
         '''
         Available channel: 0, 1, 2, 3
+        With verify, every update is acknowledged by the registers read back from the chip
         '''
 
         
@@ -54,6 +129,14 @@ class DDSSingleChannelWriter():
             float(_) * 1e3) for _ in row[1:5]]
         self.phase = [DDSSingleChannelWriter.transform_phase(
             float(_)) for _ in row[5:9]]
+        # settings written before amplitude control have no amplitude columns
+        self.amplitude = [DDSSingleChannelWriter.transform_amplitude(
+            float(_)) for _ in row[9:13]] or [DDSSingleChannelWriter.transform_amplitude(1)] * 4
+
+        self.shadow = BoardShadow.of(row[0])
+
+        self.verify = verify
+        self.profiles = {}  # name -> (frequency, phase, amplitude); slot index follows definition order
 
         self.channel = channel
         if shared_channels is None: 
@@ -62,21 +145,37 @@ class DDSSingleChannelWriter():
             shared_channels = [self.channel, shared_channels] 
         elif isinstance(shared_channels, Iterable):
             shared_channels = [self.channel] + [ch for ch in shared_channels]
+        self.shared_channels = shared_channels
+        self.ramp_channels = []
+        self._pending = None  # channels edited inside a transaction
+        self.written_at = None  # perf_counter of the last update frame written
+        self._steps = {}  # direction -> frame prepared for the next fine step, see prepare_steps
+        self._steps_base = None
+        self.tracer = NULL_TRACER  # see latency_trace.py
+        # frames sent, and those skipped since they would change no register
+        self.sent = 0
+        self.skipped = 0
         self._calculate_commands(shared_channels)
 
         if name == 'offline':
             self.write = lambda _: print('%.4f %d' % (_))
-            self.write_full = lambda _, __: print('%.4f %d' % (_, __))
-            self.upload = lambda *_: print('Uploaded to EEPROM!')
-            self.download = lambda *_: print('Downloading...')
+            self.write_amplitude = lambda _: print('%.3f' % (_))
+            self.write_full = lambda _, __, *___: print('%.4f %d' % (_, __))
+            self.upload = lambda *_, **__: print('Uploaded to EEPROM!')
+            self.download = lambda *_, **__: print('Downloading...')
+            self.readback = lambda *_: print('Reading back...')
+            self.upload_profiles = lambda *_, **__: print('Profiles uploaded!')
+            self.select_profile = lambda _: print('Profile %s' % (_))
+            self.configure_ramp = lambda *_, **__: print('Ramp configured!')
+            self.sweep_up = self.sweep_down = self.stop_ramp = lambda: print('Ramp!')
+            self.set_channel = lambda *_, **__: print('%d %s' % (_[0], __))
+            self.write_step = lambda _: False
             return
         
         self.ser = setup_arduino(row[0])
 
         # update all channels, otherwise some may not be able to open 
-        self.ser.write((15 << 4).to_bytes(1,'big')+b''.join(f.to_bytes(4, 'big') +
-                       p.to_bytes(2, 'big') for f, p in zip(self.frequency, self.phase)))
-        get_line_bin(self.ser)
+        self._update(range(4), force=True)
         
 
     @staticmethod
@@ -91,6 +190,16 @@ class DDSSingleChannelWriter():
             return round(2 ** 32 / DDSSingleChannelWriter.fclk * f)
         raise RuntimeError('Frequency should be inside [0, 250] MHz')
 
+    @staticmethod
+    def transform_amplitude(a):
+        if 0 <= a <= 1:
+            return round(1023 * a)
+        raise RuntimeError('Amplitude should be inside [0, 1]')
+
+    @staticmethod
+    def inverse_transform_amplitude(transformed_a):
+        return transformed_a / 1023
+
     @staticmethod
     def inverse_transform_phase(transformed_phi):
         return transformed_phi * (360 / 2 ** 14)
@@ -99,55 +208,481 @@ class DDSSingleChannelWriter():
     def inverse_transform_frequency(transformed_f):
         return transformed_f * (DDSSingleChannelWriter.fclk / 2 ** 32)
 
+    @staticmethod
+    def _ramp_step(words_per_tick):
+        '''
+        Split a ramp slope into (delta word, ramp rate). The shortest step keeping the
+        delta word within 0.1% of the slope wins
+        '''
+        best = None
+        for rate in range(1, DDSSingleChannelWriter.max_ramp_rate + 1):
+            word = round(words_per_tick * rate)
+            if not word:
+                continue
+            error = abs(word - words_per_tick * rate) / (words_per_tick * rate)
+            if error < 1e-3:
+                return word, rate
+            if best is None or error < best[0]:
+                best = (error, word, rate)
+        if best is None:
+            raise RuntimeError('Ramp too slow.')
+        raise RuntimeError('Ramp slope off by %.1f%% at best.' % (best[0] * 100))
+
+    @staticmethod
+    def ramp_words(mode, start, end, rising_slope, falling_slope=None):
+        '''
+        Register values of a linear sweep between start and end
+        Ramp.FREQUENCY: MHz and MHz/s; Ramp.PHASE: Deg. and Deg./s
+        Returns (start word, end word, rising delta word, falling delta word, falling rate, rising rate)
+        in the order the Arduino code expects
+        '''
+        if not start < end:
+            raise RuntimeError('Ramp should start below its end.')
+        if falling_slope is None:
+            falling_slope = rising_slope
+        if not (rising_slope > 0 and falling_slope > 0):
+            raise RuntimeError('Ramp slopes should be positive.')
+
+        fsync = DDSSingleChannelWriter.fclk * 1e3 / 4  # in Hz
+        if mode == Ramp.FREQUENCY:
+            start_word = DDSSingleChannelWriter.transform_frequency(start * 1000)
+            end_word = DDSSingleChannelWriter.transform_frequency(end * 1000)
+            words_per_unit = 2 ** 32 / (DDSSingleChannelWriter.fclk * 1e3) * 1e6
+            shift = 0
+        elif mode == Ramp.PHASE:
+            # phase words are 14 bits, MSB aligned in the 32-bit sweep registers
+            if end >= 360:
+                raise RuntimeError('Phase ramps should end below 360 Deg.')
+            start_word = DDSSingleChannelWriter.transform_phase(start)
+            end_word = DDSSingleChannelWriter.transform_phase(end) << 18
+            words_per_unit = 2 ** 14 / 360
+            shift = 18
+        else:
+            raise RuntimeError('Unknown ramp mode.')
+
+        rising_word, rising_rate = DDSSingleChannelWriter._ramp_step(rising_slope * words_per_unit / fsync)
+        falling_word, falling_rate = DDSSingleChannelWriter._ramp_step(falling_slope * words_per_unit / fsync)
+        if max(rising_word, falling_word) >= 2 ** (32 - shift):
+            raise RuntimeError('Ramp too fast.')
+        return start_word, end_word, rising_word << shift, falling_word << shift, falling_rate, rising_rate
+
     @counted_func('Update')
     def write(self, new_phi):
         print('%d' % (new_phi))
         self.phase[self.channel] = DDSSingleChannelWriter.transform_phase(
             new_phi)
-        self.ser.write(self.commands[Command.UPDATE]+b''.join(f.to_bytes(4, 'big') +
-                       p.to_bytes(2, 'big') for f, p in zip(self.frequency, self.phase)))
+        self._update()
+        print('%d' % (new_phi))
 
-        if self.ser.inWaiting:
-            get_line_bin(self.ser)
-            print('%d' % (new_phi))
+    @counted_func('Update')
+    def write_amplitude(self, new_amp):
+        self.amplitude[self.channel] = DDSSingleChannelWriter.transform_amplitude(new_amp)
+        self._update()
+        print('%.3f' % (new_amp))
 
     @counted_func('Update')
-    def write_full(self, new_freq, new_phi):
+    def write_full(self, new_freq, new_phi, new_amp=None):
         self.frequency = [
             DDSSingleChannelWriter.transform_frequency(new_freq * 1000)] * 4
         self.phase[self.channel] = DDSSingleChannelWriter.transform_phase(
             new_phi)
-        self.ser.write(self.commands[Command.UPDATE]+b''.join(f.to_bytes(4, 'big') +
-                       p.to_bytes(2, 'big') for f, p in zip(self.frequency, self.phase)))
+        if new_amp is not None:
+            self.amplitude[self.channel] = DDSSingleChannelWriter.transform_amplitude(new_amp)
+        self._update()
+        print('%.4f %d %.3f' % (new_freq, new_phi,
+            DDSSingleChannelWriter.inverse_transform_amplitude(self.amplitude[self.channel])))
+
+    def set_channel(self, ch, frequency=None, phase=None, amplitude=None):
+        '''
+        Frequency in MHz, phase in Deg. and amplitude in [0, 1] of any channel; omitted ones are kept
+        '''
+        if frequency is not None:
+            self.frequency[ch] = DDSSingleChannelWriter.transform_frequency(frequency * 1000)
+        if phase is not None:
+            self.phase[ch] = DDSSingleChannelWriter.transform_phase(phase)
+        if amplitude is not None:
+            self.amplitude[ch] = DDSSingleChannelWriter.transform_amplitude(amplitude)
+        return self._update([ch])
+
+    def _words(self, ch):
+        return self.frequency[ch], self.phase[ch], self.amplitude[ch]
+
+    @staticmethod
+    def amplitude_words(amplitudes):
+        '''
+        transform_amplitude of a whole array at once
+        '''
+        amplitudes = np.asarray(amplitudes, dtype=float)
+        if np.any((amplitudes < 0) | (amplitudes > 1)):
+            raise RuntimeError('Amplitude should be inside [0, 1]')
+        return np.rint(amplitudes * 1023).astype(np.uint16)
+
+    @staticmethod
+    def amplitude_ramp(start, end, n):
+        '''
+        n amplitude words from start to end, both in [0, 1]
+        '''
+        return DDSSingleChannelWriter.amplitude_words(np.linspace(start, end, n))
+
+    def amplitude_frames(self, words, channels=None):
+        '''
+        UPDATE frames stepping the amplitude of channels (default: this one) through words,
+        everything else as now. One frame per row, built without a Python loop
+        '''
+        if channels is None:
+            channels = [self.channel]
+        base = np.frombuffer(DDSSingleChannelWriter._command_byte(Command.UPDATE, channels) +
+                             pack_channel_parameter(self.frequency, self.phase, self.amplitude), dtype=np.uint8)
+        frames = np.tile(base, (len(words), 1))
+        for ch in channels:
+            offset = 1 + CHANNEL_LENGTH * ch + 6
+            frames[:, offset] = words >> 8
+            frames[:, offset + 1] = words & 0xff
+        return frames
+
+    def play_frames(self, frames, dwell=0.):
+        '''
+        Sends precomputed UPDATE frames, e.g. from amplitude_frames, dwell s apart.
+        The board is only held for each frame, so other writers can go on in between.
+        Returns True if every frame was acknowledged
+        '''
+        if not len(frames):
+            return True
+        channels = [ch for ch in range(4) if frames[-1, 0] >> 4 & (1 << ch)]
+        missed = 0
+        for frame in frames:
+            acked = self.send_frame(frame.tobytes())
+            missed += not acked
+            if dwell:
+                time.sleep(dwell)
+        if missed:
+            print('%d of %d frames not acknowledged!' % (missed, len(frames)))
+
+        with self.shadow.lock:
+            # the last frame is what the board holds now
+            self.frequency, self.phase, self.amplitude = map(list, unpack_channel_parameter(frames[-1, 1:].tobytes()))
+            for ch in channels:
+                self.shadow.registers[ch] = self._words(ch) if acked else None
+        return not missed
+
+    @contextmanager
+    def transaction(self):
+        '''
+        Updates inside are held back and committed in one frame, so all
+        edited channels change on the same IO_UPDATE. Nested ones join the outer
+        '''
+        if self._pending is not None:
+            yield self
+            return
+
+        saved = list(self.frequency), list(self.phase), list(self.amplitude)
+        self._pending = set()
+        try:
+            yield self
+        except BaseException:
+            self.frequency, self.phase, self.amplitude = saved
+            raise
+        finally:
+            channels, self._pending = self._pending, None
+        if channels:
+            self._update(sorted(channels))
+
+    @locked
+    def _update(self, channels=None, force=False):
+        if channels is None:
+            channels = self.shared_channels
+        if self._pending is not None:
+            self._pending.update(channels)
+            return True
+
+        # compare tuning words, not floats: many GUI steps round to what the chip already has
+        if not force:
+            channels = self.shadow.changed(channels, self.frequency, self.phase, self.amplitude)
+            if not channels:
+                self.skipped += 1
+                return True
+        self.sent += 1
+
+        frame = (DDSSingleChannelWriter._command_byte(Command.VERIFY if self.verify else Command.UPDATE, channels) +
+                 pack_channel_parameter(self.frequency, self.phase, self.amplitude))
+        self.tracer.mark('encode')
+        self.ser.write(frame)
+        self.written_at = time.perf_counter()
+        self.tracer.mark('written')
+
+        if self.verify:
+            # the readback replaces the plain ack, so verification costs no extra round trip
+            registers = self._read_registers()
+            self.tracer.mark('ack')
+            if registers is None:
+                return False
+            mismatch = self.shadow.changed(channels, self.frequency, self.phase, self.amplitude)
+            if mismatch:
+                print('Verification failed on channel %s!' % ', '.join(map(str, mismatch)))
+                return False
+            return True
 
         if self.ser.inWaiting:
-            get_line_bin(self.ser)
-            print('%.4f %d' % (new_freq, new_phi))
+            acked = get_line_bin(self.ser).strip() == b'0'
+            self.tracer.mark('ack')
+            for ch in channels:
+                self.shadow.registers[ch] = self._words(ch) if acked else None
+        return True
+
+    def prepare_steps(self, new_freq, new_phi, step, phase=False):
+        '''
+        Builds the frames of write_full one step above and below new_freq (MHz), or
+        new_phi (Deg.) if phase, so that write_step only has to send one. Not with verify
+        '''
+        self._steps = {}
+        if self.verify:
+            return
+        for direction in (1, -1):
+            if phase:
+                f, p = new_freq, (new_phi + direction * step) % 360
+            else:
+                f, p = new_freq + direction * step, new_phi
+            try:
+                frequency = [DDSSingleChannelWriter.transform_frequency(f * 1000)] * 4
+                phase_words = list(self.phase)
+                phase_words[self.channel] = DDSSingleChannelWriter.transform_phase(p)
+            except RuntimeError:
+                continue  # out of range, left for write_full to report
+            channels = self.shadow.changed(self.shared_channels, frequency, phase_words, self.amplitude)
+            frame = (DDSSingleChannelWriter._command_byte(Command.UPDATE, channels) +
+                     pack_channel_parameter(frequency, phase_words, self.amplitude)) if channels else None
+            self._steps[direction] = (f, p, frequency, phase_words, channels, frame)
+        # the frames hold only while nothing else changes the channels or the board
+        self._steps_base = (list(self.frequency), list(self.phase), list(self.amplitude), list(self.shadow.registers))
+
+    @locked
+    def write_step(self, direction):
+        '''
+        Sends the frame prepared for direction (1 or -1). Returns False, sending nothing,
+        if there is none for the current state; then use write_full
+        '''
+        if (self._pending is not None or direction not in self._steps or
+                self._steps_base != (self.frequency, self.phase, self.amplitude, self.shadow.registers)):
+            return False
+        f, p, self.frequency, self.phase, channels, frame = self._steps[direction]
+        self._steps = {}  # built around the old state
+
+        if frame is None:
+            self.skipped += 1
+        else:
+            self.sent += 1
+            self.ser.write(frame)
+            self.written_at = time.perf_counter()
+            self.tracer.mark('written')
+            if self.ser.inWaiting:
+                acked = get_line_bin(self.ser).strip() == b'0'
+                self.tracer.mark('ack')
+                for ch in channels:
+                    self.shadow.registers[ch] = self._words(ch) if acked else None
+        print('Step\t%.4f %d %.3f' % (f, p, DDSSingleChannelWriter.inverse_transform_amplitude(self.amplitude[self.channel])))
+        return True
+
+    @locked
+    def send_frame(self, frame):
+        '''
+        Sends a prepared UPDATE frame, returns True once acknowledged
+        '''
+        self.ser.write(frame)
+        return get_line_bin(self.ser).strip() == b'0'
+
+    def _read_registers(self):
+        bin_str = get_bytes_bin(self.ser, PAYLOAD_LENGTH)
+        if bin_str is None:
+            self.shadow.registers = [None] * 4
+            print('Readback failed!')
+            return None
+        words = unpack_channel_parameter(bin_str)
+        self.shadow.registers = list(zip(*words))
+        return words
+
+    @counted_func('Readback')
+    @locked
+    def readback(self):
+        '''
+        Returns the (frequency, phase, amplitude) tuning words live on the chip, None if no valid reply
+        '''
+        self.ser.write(self.commands[Command.READBACK]+b'\x00'*PAYLOAD_LENGTH)
+        words = self._read_registers()
+        if words is not None:
+            show_channel_parameter(*words)
+        return words
+
+    def define_profile(self, name, frequency=None, phase=None, amplitude=None):
+        '''
+        Frequencies in MHz, phases in Deg. and amplitudes in [0, 1], one per channel; current values if omitted
+        Redefining a name keeps its slot
+        '''
+        if frequency is None:
+            frequency = self.frequency
+        else:
+            frequency = [DDSSingleChannelWriter.transform_frequency(f * 1000) for f in frequency]
+        if phase is None:
+            phase = self.phase
+        else:
+            phase = [DDSSingleChannelWriter.transform_phase(p) for p in phase]
+        if amplitude is None:
+            amplitude = self.amplitude
+        else:
+            amplitude = [DDSSingleChannelWriter.transform_amplitude(a) for a in amplitude]
+
+        if name not in self.profiles and len(self.profiles) == DDSSingleChannelWriter.n_profiles:
+            raise RuntimeError('At most %d profiles.' % DDSSingleChannelWriter.n_profiles)
+        self.profiles[name] = (tuple(frequency), tuple(phase), tuple(amplitude))
+
+    @counted_func('Profile')
+    @locked
+    def upload_profiles(self, force=False):
+        # only slots whose content differs from the board are sent
+        sent = 0
+        for index, (name, words) in enumerate(self.profiles.items()):
+            if not force and self.shadow.profiles[index] == words:
+                continue
+            self.ser.write(((index << 4) | Command.PROFILE).to_bytes(1, 'big')+pack_channel_parameter(*words))
+            if get_line_bin(self.ser).strip() == b'0':
+                self.shadow.profiles[index] = words
+            else:
+                self.shadow.profiles[index] = None
+                print('Profile %s not acknowledged!' % name)
+            sent += 1
+        print('%d of %d profiles sent.' % (sent, len(self.profiles)))
+
+    @locked
+    def select_profile(self, name):
+        index = list(self.profiles).index(name)
+        if self.shadow.profiles[index] != self.profiles[name]:
+            raise RuntimeError('Profile %s is not on the board. Call upload_profiles first.' % name)
+        self.ser.write(((index << 4) | Command.SELECT).to_bytes(1, 'big'))
+        acked = get_line_bin(self.ser).strip() == b'0'
+        self.frequency, self.phase, self.amplitude = map(list, self.profiles[name])
+        if acked:
+            self.shadow.registers = list(zip(self.frequency, self.phase, self.amplitude))
+        else:
+            # the chip may still hold anything, so the next update must not be skipped
+            self.shadow.registers = [None] * 4
+            print('Profile %s selection not acknowledged!' % name)
+        return acked
+
+    @counted_func('Ramp')
+    @locked
+    def configure_ramp(self, mode, start, end, rising_slope, falling_slope=None):
+        '''
+        Hardware linear sweep, see ramp_words for units
+        Frequency ramps apply to shared channels, phase ramps to this channel only
+        The output sits at start until sweep_up is called
+        '''
+        words = DDSSingleChannelWriter.ramp_words(mode, start, end, rising_slope, falling_slope)
+        self.ramp_channels = self.shared_channels if mode == Ramp.FREQUENCY else [self.channel]
+
+        self.ser.write(DDSSingleChannelWriter._command_byte(Command.RAMP, self.ramp_channels) +
+                       mode.to_bytes(1, 'big') + b''.join(w.to_bytes(4, 'big') for w in words[:4]) +
+                       bytes(words[4:]))
+        self._acked('Ramp')
+
+        # the start word is written to the usual tuning word register
+        # while the output ramps, the registers are not known
+        for ch in self.ramp_channels:
+            self.shadow.registers[ch] = None
+            if mode == Ramp.FREQUENCY:
+                self.frequency[ch] = words[0]
+            else:
+                self.phase[ch] = words[0]
+        print('%s ramp %.4f -> %.4f' % ('Freq.' if mode == Ramp.FREQUENCY else 'Phase', start, end))
+
+    def _acked(self, what):
+        if get_line_bin(self.ser).strip() == b'0':
+            return True
+        print('%s not acknowledged!' % what)
+        return False
+
+    @locked
+    def sweep_up(self):
+        self.ser.write(DDSSingleChannelWriter._command_byte(Command.SWEEP_UP, self.ramp_channels))
+        return self._acked('Sweep up')
+
+    @locked
+    def sweep_down(self):
+        self.ser.write(DDSSingleChannelWriter._command_byte(Command.SWEEP_DOWN, self.ramp_channels))
+        return self._acked('Sweep down')
+
+    @locked
+    def stop_ramp(self):
+        # back to single tone at the ramp start
+        self.ser.write(DDSSingleChannelWriter._command_byte(Command.RAMP, self.ramp_channels) +
+                       Ramp.OFF.to_bytes(1, 'big') + b'\x00' * 18)
+        acked = self._acked('Ramp stop')
+        return self.sweep_down() and acked
+
+    def eeprom_outdated(self):
+        '''
+        True unless the EEPROM shadow already holds the current values of all shared channels
+        '''
+        return any(self.shadow.eeprom[ch] != self._words(ch) for ch in self.shared_channels)
 
     @counted_func('Upload')
-    def upload(self):
-        self.ser.write(self.commands[Command.UPLOAD]+b''.join(f.to_bytes(4, 'big') +
-                       p.to_bytes(2, 'big') for f, p in zip(self.frequency, self.phase)))
+    @locked
+    def upload(self, force=False):
+        # EEPROM has finite write cycles; skip when it already holds these values
+        if not force and not self.eeprom_outdated():
+            print('EEPROM already up to date.')
+            return
+        self.ser.write(self.commands[Command.UPLOAD]+pack_channel_parameter(self.frequency, self.phase, self.amplitude))
         if self.ser.inWaiting:
-            get_line_bin(self.ser)
-            print('Uploaded to EEPROM! ')
+            if get_line_bin(self.ser).strip() == b'0':
+                for ch in self.shared_channels:
+                    self.shadow.eeprom[ch] = self._words(ch)
+                print('Uploaded to EEPROM! ')
+            else:
+                for ch in self.shared_channels:
+                    self.shadow.eeprom[ch] = None
+                print('Upload not acknowledged!')
 
     @counted_func('Dnload')
-    def download(self):
+    @locked
+    def download(self, force=False):
+        # EEPROM only changes through upload, so a complete shadow is as good as a readout
+        if not force and None not in self.shadow.eeprom:
+            print('Downloading... (cached)')
+            show_channel_parameter(*zip(*self.shadow.eeprom))
+            return
         print('Downloading...')
-        self.ser.write(self.commands[Command.DNLOAD]+b'\x00'*24)
+        self.ser.write(self.commands[Command.DNLOAD]+b'\x00'*PAYLOAD_LENGTH)
         if self.ser.inWaiting:
-            show_channel_parameter(get_line_bin(self.ser))
+            bin_str = get_bytes_bin(self.ser, PAYLOAD_LENGTH)
+            if bin_str is None:
+                self.shadow.eeprom = [None] * 4
+                print('Download failed!')
+                return
+            words = unpack_channel_parameter(bin_str)
+            self.shadow.eeprom = list(zip(*words))
+            show_channel_parameter(*words)
     
     def _calculate_commands(self, sc):
         def bit_xor(a, b):
             return bytes(_ ^ __ for _, __ in zip(a, b)) 
         
         b_ch_en = sum(16 << ch for ch in sc).to_bytes(1, 'big')
-        self.commands = tuple(bit_xor(b_ch_en, cmd.to_bytes(1, 'big')) for cmd in range(4))
+        self.commands = tuple(bit_xor(b_ch_en, cmd.to_bytes(1, 'big')) for cmd in range(6))
+
+    def settings_entry(self):
+        '''
+        Row of current_settings.csv holding the current parameters
+        '''
+        return self.header+', '.join(['%.3f' % (DDSSingleChannelWriter.inverse_transform_frequency(f)/1e3)
+            for f in self.frequency] + ['%.1f' % (DDSSingleChannelWriter.inverse_transform_phase(p)) for p in self.phase] +
+            ['%.3f' % (DDSSingleChannelWriter.inverse_transform_amplitude(a)) for a in self.amplitude])
+
+    @staticmethod
+    def _command_byte(cmd, channels):
+        return (sum(16 << ch for ch in channels) | cmd).to_bytes(1, 'big')
 
+    @locked
     def send_self_check(self):
-        self.ser.write(Command.EXIT+b'\x00'*24)
+        self.ser.write(self.commands[Command.EXIT]+b'\x00'*PAYLOAD_LENGTH)
 
     # Not in use
     def close(self):
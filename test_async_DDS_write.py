@@ -0,0 +1,212 @@
+import asyncio
+
+import pytest
+import serial
+
+import async_DDS_write
+from async_DDS_write import AsyncBoard, AsyncDDSSingleChannelWriter
+from my_DDS_write import BoardShadow, Command, CHANNEL_LENGTH, PAYLOAD_LENGTH
+
+
+class FakeArduino():
+    '''
+    Stands in for the stream pair of a board running v1-force_write.ino:
+    banner, "hello" handshake, then one reply per command, delay s after it
+    '''
+
+    def __init__(self, delay=0.):
+        self.reader = None
+        self.delay = delay
+        self.frames = []
+        self.buffer = b''
+        self.ready = False
+        self.registers = bytearray(PAYLOAD_LENGTH)
+        self.eeprom = bytearray(PAYLOAD_LENGTH)
+
+    def open(self):
+        # inside the event loop, as the reader belongs to it
+        self.reader = asyncio.StreamReader()
+        self.reader.feed_data(b'Arduino setup finished!\r\n')
+        return self.reader, self
+
+    def write(self, data):
+        self.buffer += data
+        if not self.ready:
+            if b'hello' in self.buffer:
+                self.buffer = b''
+                self.ready = True
+                self._reply(b'Arduino ready!\r\n')
+            return
+        while self.buffer:
+            cmd = self.buffer[0] & 15
+            n = 0 if cmd in (Command.SELECT, Command.SWEEP_UP, Command.SWEEP_DOWN) else PAYLOAD_LENGTH
+            if len(self.buffer) < 1 + n:
+                return
+            frame, self.buffer = self.buffer[:1 + n], self.buffer[1 + n:]
+            self.frames.append(frame)
+            self._reply(self._execute(frame))
+
+    def _execute(self, frame):
+        cmd = frame[0] & 15
+        if cmd in (Command.UPDATE, Command.VERIFY, Command.UPLOAD):
+            target = self.eeprom if cmd == Command.UPLOAD else self.registers
+            for ch in range(4):
+                if frame[0] & (16 << ch):
+                    target[CHANNEL_LENGTH * ch:CHANNEL_LENGTH * (ch + 1)] = \
+                        frame[1 + CHANNEL_LENGTH * ch:1 + CHANNEL_LENGTH * (ch + 1)]
+        if cmd in (Command.READBACK, Command.VERIFY):
+            return bytes(self.registers) + b'\n'
+        if cmd == Command.DNLOAD:
+            return bytes(self.eeprom) + b'\n'
+        return b'0\r\n'
+
+    def _reply(self, data):
+        if self.delay:
+            asyncio.get_running_loop().call_later(self.delay, self.reader.feed_data, data)
+        else:
+            self.reader.feed_data(data)
+
+    async def drain(self):
+        pass
+
+    def close(self):
+        pass
+
+
+@pytest.fixture
+def board(monkeypatch):
+    '''
+    Patches the serial layer; board.opened counts connections, board.connect_delay
+    slows them down and board.failures makes the next ones fail
+    '''
+    fake = FakeArduino()
+    fake.opened = 0
+    fake.connect_delay = 0.
+    fake.failures = 0
+
+    async def open_serial_connection(url, baudrate):
+        await asyncio.sleep(fake.connect_delay)
+        if fake.failures:
+            fake.failures -= 1
+            raise serial.SerialException('port busy')
+        fake.opened += 1
+        return fake.open()
+
+    monkeypatch.setattr(async_DDS_write, 'which_port', lambda iD: iD)
+    monkeypatch.setattr(async_DDS_write, 'open_settings',
+                        lambda name: ['TEST0', '58.78', '58.78', '58.78', '58.78', '0', '0', '0', '231.5', '1', '1', '1', '1'])
+    monkeypatch.setattr(async_DDS_write.serial_asyncio, 'open_serial_connection', open_serial_connection)
+    monkeypatch.setattr(AsyncBoard, 'boards', {})
+    monkeypatch.setattr(BoardShadow, 'boards', {})
+    return fake
+
+
+def test_handshake_and_update(board):
+    async def main():
+        writer = await AsyncDDSSingleChannelWriter.open('test', 3, [0])
+        assert board.ready
+        assert board.frames[0][0] == 0xF0  # all channels forced at open
+        assert await writer.write_full(58.79, 90, .5)
+        assert board.frames[-1][0] == 0x90  # channels 0 and 3
+        assert writer.shadow.registers[3] == writer._words(3)
+        assert await writer.download() == ([0] * 4, [0] * 4, [0] * 4)
+    asyncio.run(main())
+
+
+def test_unchanged_update_is_skipped(board):
+    async def main():
+        writer = await AsyncDDSSingleChannelWriter.open('test', 3, [0])
+        await writer.write(90)
+        sent = len(board.frames)
+        assert await writer.write(90)
+        assert len(board.frames) == sent
+        assert writer.skipped == 1
+    asyncio.run(main())
+
+
+def test_verify(board):
+    async def main():
+        writer = await AsyncDDSSingleChannelWriter.open('test', 3, verify=True)
+        assert await writer.set_channel(3, amplitude=.25)
+        assert board.frames[-1][0] & 15 == Command.VERIFY
+    asyncio.run(main())
+
+
+def test_timeout_then_stale_reply_discarded(board):
+    async def main():
+        writer = await AsyncDDSSingleChannelWriter.open('test', 3, timeout=.2)
+        # the DNLOAD reply comes after the request gave up, while the next one is on the wire
+        board.delay = .3
+        with pytest.raises(asyncio.TimeoutError):
+            await writer.download(force=True)
+        assert writer.board.stale
+        board.delay = 0.
+        # taking the late 32-byte reply as this ack would fail it
+        assert await writer.write(45)
+        assert not writer.board.stale
+        assert await writer.write(46)
+    asyncio.run(main())
+
+
+def test_cancelled_request(board):
+    async def main():
+        writer = await AsyncDDSSingleChannelWriter.open('test', 3, timeout=.2)
+        board.delay = .1
+        task = asyncio.ensure_future(writer.write(45))
+        await asyncio.sleep(.01)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+        assert writer.board.stale
+        board.delay = 0.
+        assert await writer.write(46)
+        assert not writer.board.reader._buffer  # nothing left for the next request
+    asyncio.run(main())
+
+
+def test_writers_share_connection(board):
+    async def main():
+        board.connect_delay = .05
+        lo, other = await asyncio.gather(
+            AsyncDDSSingleChannelWriter.open('test', 3, [0]),
+            AsyncDDSSingleChannelWriter.open('test', 1))
+        assert lo.board is other.board
+        assert lo.shadow is other.shadow
+        assert board.opened == 1
+        assert all(await asyncio.gather(lo.write_full(58.8, 10), other.write(20)))
+    asyncio.run(main())
+
+
+def test_opener_giving_up_keeps_connection(board):
+    async def main():
+        board.connect_delay = .3
+        impatient = asyncio.ensure_future(asyncio.wait_for(AsyncBoard.of('TEST0'), .1))
+        patient = asyncio.ensure_future(asyncio.wait_for(AsyncBoard.of('TEST0'), 5))
+        with pytest.raises(asyncio.TimeoutError):
+            await impatient
+        connected = await patient
+        assert AsyncBoard.boards['TEST0'].result() is connected
+        assert board.opened == 1
+    asyncio.run(main())
+
+
+def test_failed_connection_is_retried(board):
+    async def main():
+        board.failures = 1
+        with pytest.raises(serial.SerialException):
+            await AsyncBoard.of('TEST0')
+        assert 'TEST0' not in AsyncBoard.boards
+        assert await AsyncBoard.of('TEST0')
+    asyncio.run(main())
+
+
+def test_sweep(board):
+    async def main():
+        writer = await AsyncDDSSingleChannelWriter.open('test', 3)
+        with pytest.raises(RuntimeError):
+            await writer.sweep()
+        sent = len(board.frames)
+        await writer.sweep(phases=[10, 20, 30], amplitudes=[0, .5, 1, .2])
+        assert len(board.frames) - sent == 3  # in step, as long as the shortest
+        assert writer._words(3)[1:] == (writer.phase[3], 1023)
+    asyncio.run(main())
@@ -0,0 +1,58 @@
+import pytest
+
+from my_DDS_write import DDSSingleChannelWriter, Ramp
+
+
+def test_frequency_ramp():
+    # the example of the README, 58 -> 60 MHz at 1 GHz/s up and 500 MHz/s down
+    start, end, rising, falling, falling_rate, rising_rate = \
+        DDSSingleChannelWriter.ramp_words(Ramp.FREQUENCY, 58, 60, 1e3, 5e2)
+    assert start == DDSSingleChannelWriter.transform_frequency(58e3) == 498216206
+    assert end == DDSSingleChannelWriter.transform_frequency(60e3) == 515396076
+    assert (rising, rising_rate) == (206, 3)
+    assert (falling, falling_rate) == (103, 3)
+
+
+def test_default_falling_slope():
+    words = DDSSingleChannelWriter.ramp_words(Ramp.FREQUENCY, 58, 60, 1e3)
+    assert words[2:4] == (206, 206)
+    assert words[4] == words[5]
+
+
+@pytest.mark.parametrize('slopes', [(0, None), (-1e3, None), (1e3, 0), (1e3, -5e2)])
+def test_non_positive_slope(slopes):
+    with pytest.raises(RuntimeError):
+        DDSSingleChannelWriter.ramp_words(Ramp.FREQUENCY, 58, 60, *slopes)
+
+
+def test_ramp_direction():
+    with pytest.raises(RuntimeError):
+        DDSSingleChannelWriter.ramp_words(Ramp.FREQUENCY, 60, 58, 1e3)
+
+
+def test_phase_ramp_msb_aligned():
+    start, end, rising, falling, falling_rate, rising_rate = \
+        DDSSingleChannelWriter.ramp_words(Ramp.PHASE, 90, 180, 1e6)
+    assert start == 4096  # phase register, not shifted
+    assert end == 8192 << 18
+    assert (rising, rising_rate) == (43 << 18, 118)
+    assert rising == falling
+
+
+def test_phase_ramp_end():
+    assert DDSSingleChannelWriter.ramp_words(Ramp.PHASE, 0, 359.98, 1e6)[1] == (2 ** 14 - 1) << 18
+    with pytest.raises(RuntimeError):
+        DDSSingleChannelWriter.ramp_words(Ramp.PHASE, 0, 360, 1e6)
+
+
+def test_ramp_step():
+    assert DDSSingleChannelWriter._ramp_step(68.72) == (206, 3)
+    assert DDSSingleChannelWriter._ramp_step(2.) == (2, 1)  # shortest exact step
+    with pytest.raises(RuntimeError):
+        DDSSingleChannelWriter._ramp_step(1e-4)  # no word at the slowest rate
+
+
+def test_inaccurate_slope():
+    # 1 word every 255 ticks is still 7.7% faster than asked
+    with pytest.raises(RuntimeError):
+        DDSSingleChannelWriter.ramp_words(Ramp.PHASE, 0, 180, 1e4)
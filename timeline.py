@@ -0,0 +1,123 @@
+import numpy as np
+from time import perf_counter, sleep
+
+from my_DDS_write import DDSSingleChannelWriter, Command, pack_channel_parameter, PAYLOAD_LENGTH
+
+
+ACK_LENGTH = 3  # "0\r\n"
+
+
+class Timeline():
+    '''
+    Parameter changes at given times after a start trigger, e.g.
+
+        timeline = Timeline(writer)
+        timeline.add(1.25, 3, phase=90)
+        timeline.add(2.0, 0, frequency=58.79)
+        timeline.run()
+
+    Frames are built before the start. Each one is sent ahead of its time by the
+    estimated serial latency, which is remeasured from every acknowledgement
+    '''
+
+    def __init__(self, writer):
+        self.writer = writer
+        self.events = {}  # time in s -> {channel: (frequency, phase, amplitude)}
+        self.latency = None  # round trip of an UPDATE frame, in s
+
+    def add(self, t, channel, frequency=None, phase=None, amplitude=None):
+        '''
+        Frequency in MHz, phase in Deg. and amplitude in [0, 1]; omitted ones are kept.
+        Changes at the same time share one frame, so they land on the same IO_UPDATE
+        '''
+        old_frequency, old_phase, old_amplitude = self.events.setdefault(t, {}).get(channel, (None, None, None))
+        self.events[t][channel] = (
+            old_frequency if frequency is None else DDSSingleChannelWriter.transform_frequency(frequency * 1000),
+            old_phase if phase is None else DDSSingleChannelWriter.transform_phase(phase),
+            old_amplitude if amplitude is None else DDSSingleChannelWriter.transform_amplitude(amplitude))
+        return self
+
+    def _prepare(self):
+        '''
+        Returns (time, frame, channels, frequency, phase, amplitude) of each event in order
+        '''
+        words = list(self.writer.frequency), list(self.writer.phase), list(self.writer.amplitude)
+        prepared = []
+        for t in sorted(self.events):
+            for ch, new in self.events[t].items():
+                for w, n in zip(words, new):
+                    if n is not None:
+                        w[ch] = n
+            channels = sorted(self.events[t])
+            frame = (DDSSingleChannelWriter._command_byte(Command.UPDATE, channels) +
+                     pack_channel_parameter(*words))
+            prepared.append((t, frame, channels) + tuple(list(w) for w in words))
+        return prepared
+
+    def calibrate(self, n=5):
+        '''
+        Measures the round trip with frames enabling no channel; they only pulse IO_UPDATE
+        '''
+        frame = DDSSingleChannelWriter._command_byte(Command.UPDATE, []) + b'\x00' * PAYLOAD_LENGTH
+        rtt = []
+        for _ in range(n):
+            start = perf_counter()
+            self.writer.send_frame(frame)
+            rtt.append(perf_counter() - start)
+        self.latency = float(np.median(rtt))
+        return self.latency
+
+    def run(self, smoothing=.2):
+        '''
+        Plays the timeline from now. Returns lateness statistics in s, positive when late
+        '''
+        prepared = self._prepare()
+        if not prepared:
+            return {'events': 0}
+        if self.latency is None:
+            self.calibrate()
+
+        lateness = []
+        start = perf_counter()
+        for t, frame, channels, frequency, phase, amplitude in prepared:
+            # the registers latch once the frame is in, before the ack travels back
+            uplink = len(frame) / (len(frame) + ACK_LENGTH)
+            target = start + t - self.latency * uplink
+
+            # coarse sleep, then spin on the monotonic clock for the last bit
+            remaining = target - perf_counter()
+            if remaining > 2e-3:
+                sleep(remaining - 2e-3)
+            while perf_counter() < target:
+                pass
+
+            sent = perf_counter()
+            acked = self.writer.send_frame(frame)
+            rtt = perf_counter() - sent
+
+            lateness.append(sent + rtt * uplink - (start + t))
+            self.latency += smoothing * (rtt - self.latency)
+
+            self.writer.frequency, self.writer.phase, self.writer.amplitude = frequency, phase, amplitude
+            for ch in channels:
+                self.writer.shadow.registers[ch] = self.writer._words(ch) if acked else None
+
+        self.lateness = np.array(lateness)
+        stats = {
+            'events': len(lateness),
+            'mean': float(np.mean(self.lateness)),
+            'median': float(np.median(self.lateness)),
+            'max': float(np.max(np.abs(self.lateness))),
+            'std': float(np.std(self.lateness)),
+        }
+        print('%d events, lateness mean %.3f ms, median %.3f ms, max |%.3f| ms, std %.3f ms' % (
+            stats['events'], stats['mean'] * 1e3, stats['median'] * 1e3, stats['max'] * 1e3, stats['std'] * 1e3))
+        return stats
+
+
+if __name__ == '__main__':
+    # Assume LO on channel 3 and EOM drive on channel 0
+    writer = DDSSingleChannelWriter('local', 3, [0])
+    timeline = Timeline(writer)
+    timeline.add(1.25, 3, phase=90).add(2.0, 0, frequency=58.79).add(2.0, 3, frequency=58.79)
+    timeline.run()
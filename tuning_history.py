@@ -0,0 +1,142 @@
+import numpy as np
+import matplotlib.pyplot as plt
+
+from time import perf_counter
+
+
+class RingBuffer():
+    '''
+    The last capacity (time, frequency, phase) samples, in preallocated arrays
+    '''
+
+    def __init__(self, capacity=2 ** 16):
+        self.capacity = capacity
+        self.data = np.zeros((3, capacity))
+        self.count = 0  # total appended, may exceed capacity
+
+    def append(self, t, freq, phase):
+        self.data[:, self.count % self.capacity] = t, freq, phase
+        self.count += 1
+
+    def __len__(self):
+        return min(self.count, self.capacity)
+
+    def view(self):
+        '''
+        Samples oldest first, shape (3, len(self))
+        '''
+        if self.count <= self.capacity:
+            return self.data[:, :self.count]
+        head = self.count % self.capacity
+        return np.concatenate((self.data[:, head:], self.data[:, :head]), axis=1)
+
+
+def minmax_decimate(x, y, width):
+    '''
+    Keep the min and max of y in each of width bins, so that a line drawn over
+    width pixels looks the same as with all points
+    '''
+    if len(y) <= 2 * width:
+        return x, y
+    n = len(y) // width * width
+    bins = y[-n:].reshape(width, -1)
+    x_dec = np.repeat(x[-n:].reshape(width, -1)[:, 0], 2)
+    y_dec = np.empty(2 * width)
+    y_dec[::2] = bins.min(axis=1)
+    y_dec[1::2] = bins.max(axis=1)
+    return x_dec, y_dec
+
+
+class TuningHistory():
+    '''
+    Window plotting the frequency and phase history. Lines are blitted over a cached
+    background; only when the data leaves the axes is the whole figure redrawn
+    '''
+
+    def __init__(self, title='', capacity=2 ** 16, min_interval=1 / 30.):
+        self.buffer = RingBuffer(capacity)
+        self.min_interval = min_interval  # s between renders
+        self.last_render = -np.inf
+        self.start = perf_counter()
+
+        self.fig, (self.ax_freq, self.ax_phase) = plt.subplots(2, 1, sharex=True, figsize=(6, 4))
+        self.fig.canvas.manager.set_window_title(title)
+        self.ax_freq.set_ylabel('Freq. (MHz)')
+        self.ax_phase.set_ylabel('Phase')
+        self.ax_phase.set_xlabel('Time (s)')
+        self.ax_phase.set_ylim(0, 360)
+        self.fig.tight_layout()
+
+        self.line_freq, = self.ax_freq.plot([], [], drawstyle='steps-post', animated=True)
+        self.line_phase, = self.ax_phase.plot([], [], drawstyle='steps-post', animated=True)
+
+        self.background = None
+        self.fig.canvas.mpl_connect('draw_event', self._on_draw)
+
+        # renders the end of a burst that arrived faster than min_interval
+        self.trailing = self.fig.canvas.new_timer(interval=int(min_interval * 1e3))
+        self.trailing.single_shot = True
+        self.trailing.add_callback(self._render_trailing)
+        self.pending = False
+
+    def append(self, freq, phase):
+        self.buffer.append(perf_counter() - self.start, freq, phase)
+        now = perf_counter()
+        if now - self.last_render > self.min_interval:
+            self.last_render = now
+            self.render()
+        elif not self.pending:
+            self.pending = True
+            self.trailing.start()
+
+    def _render_trailing(self):
+        self.pending = False
+        self.last_render = perf_counter()
+        self.render()
+
+    def _on_draw(self, event):
+        self.background = self.fig.canvas.copy_from_bbox(self.fig.bbox)
+        if len(self.buffer):
+            self._draw_lines(*self.buffer.view())
+
+    def _draw_lines(self, t, freq, phase):
+        width = int(self.ax_freq.bbox.width)
+        self.line_freq.set_data(*minmax_decimate(t, freq, width))
+        self.line_phase.set_data(*minmax_decimate(t, phase, width))
+        self.ax_freq.draw_artist(self.line_freq)
+        self.ax_phase.draw_artist(self.line_phase)
+
+    def _rescale(self, t, freq):
+        # grow the limits with some room, so that full redraws stay rare
+        xmin, xmax = self.ax_freq.get_xlim()
+        ymin, ymax = self.ax_freq.get_ylim()
+        rescaled = False
+        if t[0] > xmin + (xmax - xmin) / 2 or t[-1] > xmax:
+            span = max(t[-1] - t[0], 1.)
+            self.ax_freq.set_xlim(t[0], t[0] + 2 * span)
+            rescaled = True
+        lo, hi = freq.min(), freq.max()
+        if lo < ymin or hi > ymax or len(self.buffer) == 1:
+            margin = max(hi - lo, 1e-3)
+            self.ax_freq.set_ylim(lo - margin, hi + margin)
+            rescaled = True
+        return rescaled
+
+    def render(self):
+        if not len(self.buffer):
+            return
+        t, freq, phase = self.buffer.view()
+        if self._rescale(t, freq) or self.background is None:
+            self.fig.canvas.draw_idle()  # background is refreshed in _on_draw
+            return
+        self.fig.canvas.restore_region(self.background)
+        self._draw_lines(t, freq, phase)
+        self.fig.canvas.blit(self.fig.bbox)
+
+
+if __name__ == '__main__':
+    history = TuningHistory('History')
+    for k in range(10000):
+        history.buffer.append(k * 1e-3, 58.78 + 1e-4 * np.sin(k / 500), (k / 10) % 360)
+    history.render()
+    plt.show()
@@ -15,6 +15,8 @@ SPISettings settings(2000000, MSBFIRST, SPI_MODE3);
 const int chip_select = 10;
 const int io_update = 3;
 const int master_reset = 4;
+// profile pins P0-P3 of AD9959, one per channel; they set the direction of a linear sweep
+const int profile_pins[4] = { 5, 6, 7, 8 };
 
 // DDS register aliases
 byte channel_register = 0x00;
@@ -22,9 +24,20 @@ byte function_register = 0x01;
 byte frequency_register = 0x04;
 byte phase_register = 0x05;
 byte amplitude_register = 0x06;
+byte channel_function_register = 0x03;
+byte ramp_rate_register = 0x07;
+byte rising_delta_register = 0x08;
+byte falling_delta_register = 0x09;
+byte end_word_register = 0x0A;
 
 #define FREQUENCY_WORD_LENGTH 4
 #define PHASE_WORD_LENGTH 2
+#define AMPLITUDE_WORD_LENGTH 2
+#define CHANNEL_LENGTH (FREQUENCY_WORD_LENGTH + PHASE_WORD_LENGTH + AMPLITUDE_WORD_LENGTH)
+#define PAYLOAD_LENGTH (4 * CHANNEL_LENGTH)
+
+// amplitude control register: multiplier enable, ASF in the low 10 bits; see page 41
+#define AMPLITUDE_MULTIPLIER_ENABLE B00010000
 
 // see page 33 of AD9959 data sheet, also see page 35 for time series diagram
 #define SERIAL_IO_3_WIRE_MODE 1
@@ -36,6 +49,25 @@ byte amplitude_register = 0x06;
 #define UPLOAD 0x1
 #define DNLOAD 0x2
 #define EXIT 0x3
+#define READBACK 0x4
+#define VERIFY 0x5
+#define PROFILE 0x6
+#define SELECT 0x7
+#define RAMP 0x8
+#define SWEEP_UP 0x9
+#define SWEEP_DOWN 0xA
+
+// payload of RAMP: mode, start, end, rising delta, falling delta words, falling, rising ramp rates
+#define RAMP_LENGTH 19
+// mode is the AFP select field of the channel function register; 0 turns the sweep off
+#define RAMP_FREQUENCY 2
+#define RAMP_PHASE 3
+
+// profiles: full 4-channel frames kept in RAM, persisted in EEPROM after the current values
+#define PROFILE_COUNT 8
+#define PROFILE_LENGTH PAYLOAD_LENGTH
+#define PROFILE_EEPROM_OFFSET 32
+byte profiles[PROFILE_COUNT][PROFILE_LENGTH];
 
 bool self_check;
 
@@ -53,6 +85,10 @@ void setup() {
   pinMode(chip_select, OUTPUT);   //Set mode of Arduino pin used for DDS chip select
   pinMode(io_update, OUTPUT);     //Set mode of Arduino pin used for IO update
   pinMode(master_reset, OUTPUT);  //Set mode of Arduino pin used for master reset
+  for (int ch = 0; ch < 4; ++ch) {
+    pinMode(profile_pins[ch], OUTPUT);
+    digitalWrite(profile_pins[ch], LOW);
+  }
 
   // Initialize pins
   digitalWrite(master_reset, HIGH);  //Pulse high to reset all registers
@@ -60,6 +96,8 @@ void setup() {
   digitalWrite(io_update, LOW);      //Pulse high to update registers after all data is written
   digitalWrite(chip_select, HIGH);   //Set low during SPI data transfer to select chip
 
+  read_profiles();
+
   // handshake, typical of force write
   Serial.println("Arduino setup finished!");
   delay(500);
@@ -86,7 +124,7 @@ void write_DDS(byte *bytes, byte enable) {
   SPI.transfer(B11010000);          // Write to function register. This sets clock multiplier to 20
   SPI.transfer16(0);                // Pad remaining bits with zeros
 
-  //Write frequency/phase stored in bytes to DDS
+  //Write frequency/phase/amplitude stored in bytes to DDS
   for (int ch = 0; ch < 4; ++ch) {
     if (enable & 1) {
       //Set channel select register
@@ -103,8 +141,15 @@ void write_DDS(byte *bytes, byte enable) {
       SPI.transfer(phase_register);  //Initialize write to phase offset word register
       for (int i = 0; i < PHASE_WORD_LENGTH; ++i, ++bytes)
         SPI.transfer(*bytes);  //Write EEPROM bytes to phase offset word register
+
+      //Write amplitude scale factor, no amplitude ramp
+      SPI.transfer(amplitude_register);
+      SPI.transfer(0);
+      SPI.transfer(AMPLITUDE_MULTIPLIER_ENABLE | (bytes[0] & 3));
+      SPI.transfer(bytes[1]);
+      bytes += AMPLITUDE_WORD_LENGTH;
     } else {
-      bytes += (FREQUENCY_WORD_LENGTH + PHASE_WORD_LENGTH);
+      bytes += CHANNEL_LENGTH;
     }
     enable >>= 1;
   }
@@ -116,6 +161,71 @@ void write_DDS(byte *bytes, byte enable) {
   digitalWrite(io_update, LOW);
 }
 
+//****************Configure linear sweep****************
+// see page 40 of AD9959 data sheet
+void write_ramp(byte *bytes, byte enable) {
+  byte mode = bytes[0];
+  digitalWrite(chip_select, LOW);  // Start SPI
+
+  for (int ch = 0; ch < 4; ++ch) {
+    if (enable & 1) {
+      //Set channel select register
+      SPI.transfer(channel_register);
+      byte channel_byte = (16 << ch) | (SERIAL_IO_3_WIRE_MODE << 1);
+      SPI.transfer(channel_byte);
+
+      //AFP select, linear sweep enable; DAC full scale and sine output as default
+      SPI.transfer(channel_function_register);
+      SPI.transfer(mode << 6);
+      SPI.transfer(mode ? B01000011 : B00000011);
+      SPI.transfer(B00000010);
+
+      if (mode) {
+        //Start word goes to the usual tuning word register
+        if (mode == RAMP_FREQUENCY) {
+          SPI.transfer(frequency_register);
+          for (int i = 1; i < 5; ++i)
+            SPI.transfer(bytes[i]);
+        } else {
+          SPI.transfer(phase_register);
+          for (int i = 3; i < 5; ++i)
+            SPI.transfer(bytes[i]);
+        }
+
+        SPI.transfer(end_word_register);
+        for (int i = 5; i < 9; ++i)
+          SPI.transfer(bytes[i]);
+
+        SPI.transfer(rising_delta_register);
+        for (int i = 9; i < 13; ++i)
+          SPI.transfer(bytes[i]);
+
+        SPI.transfer(falling_delta_register);
+        for (int i = 13; i < 17; ++i)
+          SPI.transfer(bytes[i]);
+
+        SPI.transfer(ramp_rate_register);
+        SPI.transfer(bytes[17]);
+        SPI.transfer(bytes[18]);
+      }
+    }
+    enable >>= 1;
+  }
+  digitalWrite(chip_select, HIGH);  // Stop SPI
+
+  digitalWrite(io_update, HIGH);
+  digitalWrite(io_update, LOW);
+}
+
+//****************Set sweep direction****************
+void write_profile_pins(byte enable, byte level) {
+  for (int ch = 0; ch < 4; ++ch) {
+    if (enable & 1)
+      digitalWrite(profile_pins[ch], level);
+    enable >>= 1;
+  }
+}
+
 //****************Write EEPROM****************
 void write_EEPROM(byte *bytes, byte enable) {
   //Write frequencies stored in bytes to EEPROM
@@ -126,8 +236,11 @@ void write_EEPROM(byte *bytes, byte enable) {
 
       for (int i = 0; i < PHASE_WORD_LENGTH; ++i, ++bytes)
         EEPROM.update((ch << 1) | 16 | i, *bytes);
+
+      for (int i = 0; i < AMPLITUDE_WORD_LENGTH; ++i, ++bytes)
+        EEPROM.update((ch << 1) | 24 | i, *bytes);
     } else {
-      bytes += (FREQUENCY_WORD_LENGTH + PHASE_WORD_LENGTH);
+      bytes += CHANNEL_LENGTH;
     }
     enable >>= 1;
   }
@@ -142,6 +255,10 @@ void show_EEPROM() {
 
     for (int i = 0; i < PHASE_WORD_LENGTH; ++i)
       Serial.print((char)EEPROM.read((ch << 1) | 16 | i));
+
+    // never written reads 0xFFFF, i.e. full scale
+    for (int i = 0; i < AMPLITUDE_WORD_LENGTH; ++i)
+      Serial.print((char)EEPROM.read((ch << 1) | 24 | i));
   }
   Serial.print('\n');
 }
@@ -155,6 +272,23 @@ void read_EEPROM(byte *bytes) {
 
     for (int i = 0; i < PHASE_WORD_LENGTH; ++i, ++bytes)
       *bytes = EEPROM.read((ch << 1) | 16 | i);
+
+    for (int i = 0; i < AMPLITUDE_WORD_LENGTH; ++i, ++bytes)
+      *bytes = EEPROM.read((ch << 1) | 24 | i);
+  }
+}
+
+//****************Profiles****************
+void read_profiles() {
+  for (int k = 0; k < PROFILE_COUNT; ++k)
+    for (int i = 0; i < PROFILE_LENGTH; ++i)
+      profiles[k][i] = EEPROM.read(PROFILE_EEPROM_OFFSET + k * PROFILE_LENGTH + i);
+}
+
+void write_profile(byte *bytes, byte index) {
+  for (int i = 0; i < PROFILE_LENGTH; ++i, ++bytes) {
+    profiles[index][i] = *bytes;
+    EEPROM.update(PROFILE_EEPROM_OFFSET + index * PROFILE_LENGTH + i, *bytes);
   }
 }
 
@@ -184,6 +318,15 @@ int compare_registers(byte *bytes) {
         digitalWrite(chip_select, HIGH);
         return 1;
       }
+
+    //Read from amplitude control register; only the 10 ASF bits are compared
+    SPI.transfer(READ_INSTRUCTION | amplitude_register);
+    SPI.transfer(0);
+    if ((bytes[0] & 3) != (SPI.transfer(0) & 3) || bytes[1] != SPI.transfer(0)) {
+      digitalWrite(chip_select, HIGH);
+      return 1;
+    }
+    bytes += AMPLITUDE_WORD_LENGTH;
   }
   //Finish SPI communication
   digitalWrite(chip_select, HIGH);
@@ -191,33 +334,118 @@ int compare_registers(byte *bytes) {
 }
 
 
+//****************Read waveform parameter tuning words****************
+void read_registers(byte *bytes) {
+  digitalWrite(chip_select, LOW);  //Start SPI
+
+  for (int ch = 0; ch < 4; ++ch) {
+    //Set channel select register
+    SPI.transfer(channel_register);                                 //Initialize write to channel select register
+    byte channel_byte = (16 << ch) | (SERIAL_IO_3_WIRE_MODE << 1);  //Calculate byte for channel register
+    SPI.transfer(channel_byte);                                     //Write channel register
+
+    //Read from frequency tuning word register
+    SPI.transfer(READ_INSTRUCTION | frequency_register);
+    for (int i = 0; i < FREQUENCY_WORD_LENGTH; ++i, ++bytes)
+      *bytes = SPI.transfer(0);
+
+    //Read from phase tuning word register
+    SPI.transfer(READ_INSTRUCTION | phase_register);
+    for (int i = 0; i < PHASE_WORD_LENGTH; ++i, ++bytes)
+      *bytes = SPI.transfer(0);
+
+    //Read from amplitude control register, keep ASF
+    SPI.transfer(READ_INSTRUCTION | amplitude_register);
+    SPI.transfer(0);
+    *bytes++ = SPI.transfer(0) & 3;
+    *bytes++ = SPI.transfer(0);
+  }
+  //Finish SPI communication
+  digitalWrite(chip_select, HIGH);
+}
+
+//****************Show registers****************
+// Same layout as show_EEPROM, so both replies decode alike on the host
+void show_registers() {
+  byte bytes[PAYLOAD_LENGTH];
+  read_registers(bytes);
+  Serial.write(bytes, PAYLOAD_LENGTH);
+  Serial.print('\n');
+}
+
+
+//****************Payload length following the command byte****************
+int payload_length(byte command) {
+  if (command == SELECT || command == SWEEP_UP || command == SWEEP_DOWN)
+    return 0;  // a single byte, for the lowest latency
+  if (command == RAMP)
+    return RAMP_LENGTH;
+  return PAYLOAD_LENGTH;
+}
+
+
 void loop() {
   /***
-  * 1 command + 4 channel x 6 bytes
+  * 1 command + 4 channel x 8 bytes (command only for select)
   * Available commands: 
   * 0x00 update
   * 0x01 upload EEPROM 
   * 0x02 download EEPROM
-  * Inside each 6 bytes:
-  * High 4 bytes: frequency; low 2 bytes: phase
+  * 0x03 back to self check
+  * 0x04 read back registers of all channels
+  * 0x05 update, acknowledged by reading back registers of all channels
+  * 0x06 store profile; high 4 bits of the command byte give its index
+  * 0x07 select profile; high 4 bits give its index, no payload follows
+  * 0x08 configure linear sweep, see RAMP_LENGTH for payload
+  * 0x09 sweep up (profile pin high), no payload follows
+  * 0x0A sweep down (profile pin low), no payload follows
+  * Inside each 8 bytes:
+  * 4 bytes frequency, 2 bytes phase, 2 bytes amplitude (low 10 bits)
   */
-  byte bytes[25];
+  byte bytes[1 + PAYLOAD_LENGTH];
 
-  //Write frequency/phase values sent over serial to EEPROM
+  //Write frequency/phase/amplitude values sent over serial to EEPROM
   if (Serial.available()) {
     // this line may not be in need as setting up serial connection means setup() is called
     self_check = false;
-    Serial.readBytes(bytes, 25);
-    if ((*bytes & 3) == UPDATE) {
+    Serial.readBytes(bytes, 1);
+    Serial.readBytes(bytes + 1, payload_length(*bytes & 15));
+    if ((*bytes & 15) == UPDATE) {
       write_DDS(bytes + 1, *bytes >> 4);
       Serial.println(0);
-    } else if ((*bytes & 3) == UPLOAD) {
+    } else if ((*bytes & 15) == UPLOAD) {
       write_EEPROM(bytes + 1, *bytes >> 4);
       Serial.println(0);
-    } else if ((*bytes & 3) == DNLOAD) {
+    } else if ((*bytes & 15) == DNLOAD) {
       show_EEPROM();
-    } else if ((*bytes & 3) == EXIT) {
+    } else if ((*bytes & 15) == EXIT) {
       self_check = true;
+    } else if ((*bytes & 15) == READBACK) {
+      show_registers();
+    } else if ((*bytes & 15) == VERIFY) {
+      write_DDS(bytes + 1, *bytes >> 4);
+      show_registers();
+    } else if ((*bytes & 15) == PROFILE) {
+      if ((*bytes >> 4) < PROFILE_COUNT) {
+        write_profile(bytes + 1, *bytes >> 4);
+        Serial.println(0);
+      } else
+        Serial.println(1);
+    } else if ((*bytes & 15) == SELECT) {
+      if ((*bytes >> 4) < PROFILE_COUNT) {
+        write_DDS(profiles[*bytes >> 4], 15);
+        Serial.println(0);
+      } else
+        Serial.println(1);
+    } else if ((*bytes & 15) == RAMP) {
+      write_ramp(bytes + 1, *bytes >> 4);
+      Serial.println(0);
+    } else if ((*bytes & 15) == SWEEP_UP) {
+      write_profile_pins(*bytes >> 4, HIGH);
+      Serial.println(0);
+    } else if ((*bytes & 15) == SWEEP_DOWN) {
+      write_profile_pins(*bytes >> 4, LOW);
+      Serial.println(0);
     }
   }
   if (self_check) {